@@ -13,13 +13,17 @@ The system follows a sequential process:
 """
 
 from typing import List, Optional, Dict, Any
+from functools import lru_cache
 from crewai import Agent, Crew, Process, Task, LLM
+from crewai.tasks.conditional_task import ConditionalTask
 from crewai.project import CrewBase, agent, crew, task
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from dotenv import load_dotenv
 import os
 import uuid
+import hashlib
 import logging
+import orjson
 from pathlib import Path
 
 from crew.rule_validation_agent import ChiefQAEngineerWithTask
@@ -31,10 +35,12 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
-if not os.environ.get('OPENAI_API_KEY'):
-    raise EnvironmentError("OPENAI_API_KEY environment variable not set. Please configure it in your .env file.")
+@lru_cache(maxsize=1)
+def get_log_dir() -> Path:
+    """Return the crew log directory, creating it on first use."""
+    log_dir = Path('logs')
+    log_dir.mkdir(exist_ok=True)
+    return log_dir
 
 
 class Parameter(BaseModel):
@@ -44,28 +50,125 @@ class Parameter(BaseModel):
     description: str = Field(..., description="Detailed description of the parameter")
     unit: str = Field(..., description="Unit of measurement for the parameter")
     
-    class Config:
-        """Pydantic configuration."""
-        schema_extra = {
+    model_config = ConfigDict(
+        frozen=True,
+        json_schema_extra={
             "example": {
                 "parameter": "engine_temperature",
                 "description": "Temperature of the engine during operation",
                 "unit": "°C"
             }
         }
+    )
     
 
 class ParameterList(BaseModel):
     """Collection of truck operation parameters."""
     
     parameters: List[Parameter] = Field(..., description="List of parameters")
+
+    model_config = ConfigDict(frozen=True)
     
     
 class NewRuleList(BaseModel):
     """Collection of extracted or refined rules."""
     
     new_rules: List[str] = Field(..., description="List of rules")
-       
+
+    model_config = ConfigDict(frozen=True)
+
+
+# Model prefixes for which litellm forwards explicit prompt caching markers.
+# OpenAI models cache repeated prompt prefixes automatically.
+CACHE_CONTROL_MODEL_PREFIXES = ("anthropic/", "claude", "bedrock/anthropic", "vertex_ai/", "gemini/")
+
+
+# Set to a non-empty value to reuse stored responses for identical prompts
+# (e.g. when re-running the crew with the same inputs during development)
+RESPONSE_CACHE_ENV = "CREW_RESPONSE_CACHE"
+RESPONSE_CACHE_DIR = Path.home() / ".cache" / "crew_rules"
+# Responses are only reused when sampling is (nearly) deterministic
+RESPONSE_CACHE_MAX_TEMPERATURE = 0.1
+
+
+class PromptCachingLLM(LLM):
+    """
+    LLM that marks the static system prompt of an agent as cacheable.
+
+    The system message holds the agent's role, goal and backstory, which are
+    identical across runs. Providers that need an explicit marker get a
+    ``cache_control`` block on it; for other providers messages are passed
+    through unchanged.
+
+    When the ``CREW_RESPONSE_CACHE`` environment variable is set, text responses
+    to tool-free calls are additionally stored on disk and reused for identical
+    requests.
+    """
+
+    def call(self, messages, *args, **kwargs):
+        cache_file = self._response_cache_file(messages, *args, **kwargs)
+        if cache_file is not None and cache_file.exists():
+            return orjson.loads(cache_file.read_bytes())["response"]
+
+        if isinstance(messages, list) and self.model.startswith(CACHE_CONTROL_MODEL_PREFIXES):
+            messages = [
+                self._mark_cacheable(message) if message.get("role") == "system" else message
+                for message in messages
+            ]
+        response = super().call(messages, *args, **kwargs)
+
+        if cache_file is not None and isinstance(response, str):
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            temp_file = cache_file.with_suffix(f".{uuid.uuid4().hex}.tmp")
+            temp_file.write_bytes(orjson.dumps({"model": self.model, "response": response}))
+            temp_file.replace(cache_file)
+        return response
+
+    def _response_cache_file(self, messages, tools=None, *args, **kwargs) -> Optional[Path]:
+        """Return the cache file for this request, or None if it must not be cached."""
+        if not os.environ.get(RESPONSE_CACHE_ENV) or tools:
+            return None
+        if self.temperature is None or self.temperature > RESPONSE_CACHE_MAX_TEMPERATURE:
+            return None
+        key = orjson.dumps(
+            {"model": self.model, "temperature": self.temperature, "messages": messages},
+            option=orjson.OPT_SORT_KEYS,
+            default=str
+        )
+        return RESPONSE_CACHE_DIR / f"{hashlib.sha256(key).hexdigest()}.json"
+
+    @staticmethod
+    def _mark_cacheable(message: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a plain text message into a content block with an ephemeral cache marker."""
+        content = message.get("content")
+        if not isinstance(content, str):
+            return message
+        return {
+            **message,
+            "content": [{"type": "text", "text": content, "cache_control": {"type": "ephemeral"}}]
+        }
+
+
+@lru_cache(maxsize=1)
+def get_llm() -> PromptCachingLLM:
+    """
+    Create the language model shared by all agents.
+
+    Environment variables are loaded on first use rather than at import time,
+    so importing this module neither reads the .env file nor requires the API key.
+
+    Raises:
+        EnvironmentError: If OPENAI_API_KEY is not configured
+    """
+    load_dotenv()
+    if not os.environ.get('OPENAI_API_KEY'):
+        raise EnvironmentError("OPENAI_API_KEY environment variable not set. Please configure it in your .env file.")
+    return PromptCachingLLM(
+        model="gpt-4o-mini",
+        temperature=0.1,
+        api_key=os.environ.get('OPENAI_API_KEY')
+    )
+
 
 @CrewBase
 class RulesExtractionAndIntegrationCrew:
@@ -79,18 +182,15 @@ class RulesExtractionAndIntegrationCrew:
     Attributes:
         agents_config (str): Path to the YAML configuration file for agents
         tasks_config (str): Path to the YAML configuration file for tasks
-        llm (LLM): Language model instance used by the agents
+        llm (PromptCachingLLM): Language model instance used by the agents
     """
     
     agents_config = 'config/agents.yaml'
     tasks_config = 'config/tasks.yaml'
     
-    # Initialize LLM with appropriate settings
-    llm = LLM(
-        model="gpt-4o-mini", 
-        temperature=0.1, 
-        api_key=os.environ.get('OPENAI_API_KEY')
-    ) 
+    def __init__(self):
+        # The LLM is created on instantiation instead of at class definition
+        self.llm = get_llm()
 
     ### Agents ###
     @agent
@@ -225,14 +325,17 @@ class RulesExtractionAndIntegrationCrew:
         Create a task to format the final set of rules for implementation.
         
         This task structures the validated rules in a format suitable for
-        deployment in production systems.
+        deployment in production systems. It is a conditional task, so that
+        it can wait for the QA validation before its context is built; by
+        default it is always executed.
         
         Returns:
             Task: Configured rule formatting task
         """
-        return Task(
+        return ConditionalTask(
             config=self.tasks_config['format_rules_task'],
-            output_pydantic=NewRuleList
+            output_pydantic=NewRuleList,
+            condition=lambda previous_output: True
         )
 
     @crew
@@ -255,20 +358,26 @@ class RulesExtractionAndIntegrationCrew:
             )
             
             # Generate a unique run ID for tracking this execution
-            run_id = uuid.uuid4()
+            run_id = uuid.uuid4().hex
 
-            # Ensure logs directory exists
-            log_dir = Path('logs')
-            log_dir.mkdir(exist_ok=True)
-            
-            log_file_path = log_dir / f"crew_output_{run_id}.log"
+            log_file_path = get_log_dir() / f"crew_output_{run_id}.log"
             logger.info(f"Creating new crew execution with ID: {run_id}")
             logger.info(f"Logs will be saved to: {log_file_path}")
 
+            # Every task consumes the output of the one before it
+            # (parameters -> extraction -> integration -> QA -> formatting),
+            # so there are no independent branches to run asynchronously.
+            # Declare the formatting task's dependency on the QA task explicitly
+            # instead of relying on the implicit "previous output" context.
+            format_rules_task = self.format_rules_task()
+            format_rules_task.context = [chief_qa_validator.task]
+            # The QA output is validated in the background; wait for it before formatting
+            format_rules_task.condition = chief_qa_validator.wait_for_validation
+
             # Assemble and return the complete crew
             return Crew(
-                agents=self.agents[:-1] + [chief_qa_validator.agent] + [self.data_engineer()], 
-                tasks=self.tasks[:-1] + [chief_qa_validator.task] + [self.format_rules_task()],
+                agents=self.agents[:-1] + [chief_qa_validator.agent] + [self.data_engineer()],
+                tasks=self.tasks[:-1] + [chief_qa_validator.task] + [format_rules_task],
                 process=Process.sequential,
                 verbose=True,
                 output_log_file=str(log_file_path)
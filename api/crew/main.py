@@ -2,7 +2,6 @@
 import warnings
 import argparse
 import sys
-from crew import RulesExtractionAndIntegrationCrew
 
 warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
 
@@ -19,6 +18,18 @@ def parse_args():
     parser.add_argument("--python_code_path")
     return parser.parse_args()
 
+def get_crew():
+    """
+    Build a fresh crew for a kickoff.
+
+    The crew holds per-run state (run id and log file, task outputs, merged and
+    validated rules), so it is not reused across kickoffs. CrewAI is imported
+    here so that argument parsing does not pay for it.
+    """
+    from crew import RulesExtractionAndIntegrationCrew
+
+    return RulesExtractionAndIntegrationCrew().crew()
+
 def run(expert_text:str, rules:list, dataset_columns:list):
     """
     Run the crew.
@@ -30,7 +41,7 @@ def run(expert_text:str, rules:list, dataset_columns:list):
         'dataset_columns': dataset_columns
     }
     
-    result = RulesExtractionAndIntegrationCrew().crew().kickoff(inputs=inputs)
+    result = get_crew().kickoff(inputs=inputs)
     
 if __name__ == "__main__":
     if len(sys.argv) == 1:
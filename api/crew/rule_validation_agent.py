@@ -1,17 +1,235 @@
-from crewai import Agent, Task, Crew, Process
+from crewai import Agent, Task
+from crewai.tasks.conditional_task import ConditionalTask
+from crewai.tasks.output_format import OutputFormat
 from crewai.tasks.task_output import TaskOutput
-from crewai.crew import CrewOutput
 import re
-import json
+import orjson
+import itertools
+import math
+from functools import lru_cache
+from typing import Optional
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+# Runs rule validation (and possible LLM fix round trips) off the crew's worker thread;
+# the formatting task waits for it through wait_for_validation before it starts
+VALIDATION_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="rule-validation")
+
+# Maximum number of LLM round trips spent on fixing rules that could not be repaired locally
+MAX_FIX_ATTEMPTS = 2
+
+# Matches a whole rule regardless of keyword casing, e.g. 'if x > 1 then outlier'
+RULE_PATTERN = re.compile(r'^IF\s+(.*?)\s+THEN\s+(OUTLIER|INLIER)$', re.IGNORECASE)
+
+# Patterns used to extract rules from the agent's output
+# Fenced code blocks; the optional language tag (e.g. ```json) is not part of the captured block
+CODE_BLOCK_PATTERN = re.compile(r'```(?:[\w+-]*\n)?\s*([\s\S]*?)\s*```')
+OUTLIER_RULE_PATTERN = re.compile(r'IF .*THEN OUTLIER', re.DOTALL)
+# Quoted rules, optionally as numbered list items, e.g. '1. "IF ... THEN OUTLIER"'
+QUOTED_RULE_PATTERN = re.compile(r'^(?:\d+\.\s*)?(["\'])(IF.*THEN OUTLIER)\1')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+# Single comparison of a condition, e.g. 'Distance [km] > 135.75 km'; the parameter is
+# matched greedily so that comparison signs inside parameter names (e.g. 'p>100 bar') are skipped
+COMPARISON_PATTERN = re.compile(r'^(?P<parameter>.+)\s(?P<operator><=|>=|==|<|>)\s+(?P<value>-?\d+(?:\.\d+)?)')
+
+# Validation errors reported for individual rules
+NOT_A_STRING = "rule must be a string."
+CONTAINS_INLIER = "rule contains INLIER but should only contain OUTLIER."
+WRONG_PATTERN = "rule does not follow pattern 'IF ... THEN OUTLIER'."
+CONTAINS_OR = "rule contains 'OR' which is not allowed."
+
+
+def split_top_level(text, separator):
+    """
+    Split text on separator, ignoring separators nested inside parentheses.
+    The separator is an uppercase keyword (e.g. ' OR ') and is matched regardless of casing.
+    """
+    upper_text = text.upper()
+    parts = []
+    depth = 0
+    start = 0
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif depth == 0 and upper_text.startswith(separator, i):
+            parts.append(text[start:i])
+            i += len(separator)
+            start = i
+            continue
+        i += 1
+    parts.append(text[start:])
+    return parts
+
+
+def strip_outer_parentheses(text):
+    """
+    Remove parentheses enclosing the whole text, e.g. '(a OR b)' -> 'a OR b'.
+    """
+    text = text.strip()
+    while text.startswith('(') and text.endswith(')'):
+        depth = 0
+        for i, char in enumerate(text):
+            if char == '(':
+                depth += 1
+            elif char == ')':
+                depth -= 1
+                if depth == 0:
+                    break
+        if i != len(text) - 1:
+            break
+        text = text[1:-1].strip()
+    return text
+
+
+def expand_condition(condition):
+    """
+    Expand a condition containing OR alternatives into a list of AND-only conditions.
+    Keywords are matched regardless of casing, like IF/THEN in RULE_PATTERN. A condition
+    (or AND term) without OR is returned unchanged.
+
+    'A > 1 AND (B < 2 OR C > 3)' -> ['A > 1 AND B < 2', 'A > 1 AND C > 3']
+    """
+    if ' OR ' not in condition.upper():
+        return [condition]
+    
+    condition = strip_outer_parentheses(condition)
+    alternatives = split_top_level(condition, ' OR ')
+    if len(alternatives) > 1:
+        return [expanded for alternative in alternatives for expanded in expand_condition(alternative)]
+
+    terms = split_top_level(condition, ' AND ')
+    if len(terms) == 1:
+        return [condition]
+
+    return [' AND '.join(combination) for combination in itertools.product(*(expand_condition(term) for term in terms))]
+
+
+def is_satisfiable(condition):
+    """
+    Check whether the comparisons of an AND-only condition can all hold at the same time,
+    i.e. no parameter is restricted to an empty range as in 'x > 10 AND x < 5'.
+    Terms that are not simple comparisons are ignored.
+    """
+    # Per parameter: (lower bound, lower bound is strict), (upper bound, upper bound is inclusive)
+    bounds = {}
+    for term in split_top_level(condition, ' AND '):
+        match = COMPARISON_PATTERN.match(strip_outer_parentheses(term))
+        if not match:
+            continue
+        
+        parameter = match.group('parameter').strip()
+        operator = match.group('operator')
+        value = float(match.group('value'))
+        lower, upper = bounds.get(parameter, ((-math.inf, False), (math.inf, True)))
+        if operator in ('>', '>=', '=='):
+            lower = max(lower, (value, operator == '>'))
+        if operator in ('<', '<=', '=='):
+            upper = min(upper, (value, operator != '<'))
+        
+        if lower[0] > upper[0] or (lower[0] == upper[0] and (lower[1] or not upper[1])):
+            return False
+        bounds[parameter] = (lower, upper)
+    
+    return True
+
+
+def canonical_rule(rule):
+    """
+    Normalize a rule for comparison: collapse whitespace, drop a trailing period and ignore casing.
+    """
+    return WHITESPACE_PATTERN.sub(' ', rule.strip().rstrip('.')).upper()
+
+
+def deduplicate_rules(rules, seen=None):
+    """
+    Remove duplicate rules, keeping the first occurrence of each rule in the original order.
+    Rules whose canonical form is in seen are dropped as well; seen is updated in place.
+    """
+    seen = set() if seen is None else seen
+    unique = []
+    for rule in rules:
+        key = canonical_rule(rule)
+        if key not in seen:
+            seen.add(key)
+            unique.append(rule)
+    return unique
+
+
+def rule_from_block_line(line):
+    """
+    Return the rule contained in a line of a code block, or None if there is none.
+    """
+    line = line.strip()
+    if "IF " not in line:
+        return None
+    if line.startswith('"') and "THEN OUTLIER" in line:
+        return line.strip('"').strip("'")
+    if OUTLIER_RULE_PATTERN.match(line):
+        return line
+    return None
+
+
+@lru_cache(maxsize=256)
+def rules_from_block(block):
+    """
+    Return the rules contained in a fenced code block as a tuple.
+    JSON blocks (a list of rules or a NewRuleList object) are parsed as such,
+    anything else line by line.
+    Cached, so that blocks parsed while the agent is still working are not parsed again.
+    """
+    # Try to parse as JSON, skipping blocks that can't be JSON at all
+    if block.startswith(('{', '[')):
+        try:
+            json_rules = orjson.loads(block)
+        except orjson.JSONDecodeError:
+            json_rules = None
+        if isinstance(json_rules, dict):
+            # Handle the NewRuleList pydantic model output format
+            json_rules = json_rules.get("new_rules")
+        if isinstance(json_rules, list):
+            return tuple(
+                rule for rule in json_rules
+                if isinstance(rule, str) and "IF " in rule and "THEN OUTLIER" in rule
+            )
+    
+    # Process the block line by line
+    return tuple(filter(None, map(rule_from_block_line, block.splitlines())))
+
+
+def rule_from_text_line(line):
+    """
+    Return the rule contained in a line of plain output text, or None if there is none.
+    """
+    if "THEN OUTLIER" not in line:
+        return None
+    line = line.strip()
+    if OUTLIER_RULE_PATTERN.match(line):
+        return line
+    # Match quoted rules and list items with quoted rules
+    match = QUOTED_RULE_PATTERN.match(line)
+    return match.group(2) if match else None
+
 
 class RuleValidationAgent:
+    __slots__ = (
+        'ai_model', '_rule_sets', '_expected_rule_count', 'validated_rules',
+        'agent', 'task', 'original_task_description'
+    )
+    
     def __init__(self, llm, role, goal, backstory, task_description, expected_output, context=[], rule_sets=[]):        
         self.ai_model = llm
         self.rule_sets = rule_sets  # The two sets of rules to be combined
         self.validated_rules = []  # Store rules in memory instead of writing to file
 
         # Initialize an Agent instance for this task
-        self.agent = Agent(role=role, goal=goal, backstory=backstory, allow_delegation=False, llm=llm)
+        self.agent = Agent(
+            role=role, goal=goal, backstory=backstory, allow_delegation=False, llm=llm,
+            step_callback=self.step_callback
+        )
         
         # Create a Task instance based on the provided parameters
         if len(context) == 0:
@@ -22,6 +240,32 @@ class RuleValidationAgent:
         # Store the original task description for reference
         self.original_task_description = task_description
     
+    @property
+    def rule_sets(self):
+        """The sets of rules to be combined."""
+        return self._rule_sets
+
+    @rule_sets.setter
+    def rule_sets(self, rule_sets):
+        # Count the input outlier rules once; the count is used on every validation pass
+        self._rule_sets = rule_sets
+        self._expected_rule_count = sum(
+            1
+            for rule_set in rule_sets if isinstance(rule_set, list)
+            for rule in rule_set if type(rule) is str and "THEN OUTLIER" in rule
+        )
+
+    def step_callback(self, step_output):
+        """
+        Parse the code blocks completed in an intermediate step of the agent.
+        The final output repeats these blocks, so by the time the task finishes
+        extract_rules_from_output finds them already parsed.
+        """
+        text = getattr(step_output, 'text', None)
+        if isinstance(text, str) and '```' in text:
+            for block in CODE_BLOCK_PATTERN.findall(text):
+                rules_from_block(block)
+    
     def extract_rules_from_output(self, output_text):
         """
         Extract rules from the agent's output text.
@@ -30,56 +274,44 @@ class RuleValidationAgent:
         rules = []
         
         # Try to find rules in code blocks
-        code_blocks = re.findall(r'```(?:.*?)\s*([\s\S]*?)\s*```', output_text)
-        for block in code_blocks:
-            # Try to parse as JSON
-            try:
-                json_rules = json.loads(block)
-                if isinstance(json_rules, list):
-                    for rule in json_rules:
-                        if isinstance(rule, str) and "IF " in rule and "THEN OUTLIER" in rule:
-                            rules.append(rule)
-                    continue
-                elif isinstance(json_rules, dict) and "new_rules" in json_rules:
-                    # Handle the NewRuleList pydantic model output format
-                    new_rules = json_rules.get("new_rules", [])
-                    if isinstance(new_rules, list):
-                        for rule in new_rules:
-                            if isinstance(rule, str) and "IF " in rule and "THEN OUTLIER" in rule:
-                                rules.append(rule)
-                        continue
-            except:
-                pass
-            
-            # Process the block line by line
-            block_lines = block.strip().split('\n')
-            for line in block_lines:
-                line = line.strip()
-                if line.startswith('"') and "IF " in line and "THEN OUTLIER" in line:
-                    rule = line.strip('"').strip("'")
-                    rules.append(rule)
-                elif line.startswith("IF ") and "THEN OUTLIER" in line:
-                    rules.append(line)
+        for block in CODE_BLOCK_PATTERN.findall(output_text):
+            rules.extend(rules_from_block(block))
         
         # If no rules found in code blocks, try to find rules directly in the text
         if not rules:
-            lines = output_text.split('\n')
-            for line in lines:
-                line = line.strip()
-                if line.startswith("IF ") and "THEN OUTLIER" in line:
-                    rules.append(line)
-                # Match lines that look like list items with rules
-                elif re.match(r'^\d+\.\s*"IF.*THEN OUTLIER"', line):
-                    match = re.search(r'"(IF.*THEN OUTLIER)"', line)
-                    if match:
-                        rules.append(match.group(1))
-                # Match quoted rules
-                elif (re.match(r'^"IF.*THEN OUTLIER"', line) or 
-                      re.match(r'^\'IF.*THEN OUTLIER\'', line)):
-                    rule = line.strip('"').strip("'")
-                    rules.append(rule)
+            rules.extend(filter(None, map(rule_from_text_line, output_text.splitlines())))
         
-        return rules
+        # The same rule is often given both in a code block and inline
+        return deduplicate_rules(rules)
+    
+    def repair_rules(self, rules):
+        """
+        Fix formatting issues in the rules locally, without involving the LLM.
+        Strips quotes, normalizes keyword casing, drops INLIER rules and splits rules containing OR.
+        Rules that can't be parsed are kept as they are, so that validation reports them.
+        """
+        repaired = []
+        seen = set()
+        for rule in rules:
+            if not isinstance(rule, str):
+                repaired.append(rule)
+                continue
+            
+            match = RULE_PATTERN.match(rule.strip().strip('"\',').strip())
+            if not match:
+                repaired.append(rule)
+                continue
+            
+            condition, state = match.groups()
+            if state.upper() == "INLIER":
+                continue
+            
+            # Splitting OR alternatives may reproduce rules that are already present
+            repaired.extend(deduplicate_rules(
+                (f"IF {expanded} THEN OUTLIER" for expanded in expand_condition(condition)), seen
+            ))
+        
+        return repaired
     
     def validate_rules(self, rules):
         """
@@ -98,54 +330,53 @@ class RuleValidationAgent:
             errors.append("No rules found in the output.")
             return False, errors
         
-        # Validate each rule
-        for i, rule in enumerate(rules):
+        # Validate each rule, collecting the numbers of the offending rules per error
+        invalid_rules = defaultdict(list)
+        for number, rule in enumerate(rules, 1):
             # Check if rule is a string
-            if not isinstance(rule, str):
-                errors.append(f"Rule {i+1} must be a string, got {type(rule).__name__}.")
+            if type(rule) is not str:
+                invalid_rules[NOT_A_STRING].append(number)
                 continue
             
             # Check if rule contains "INLIER" (not allowed)
             if "THEN INLIER" in rule:
-                errors.append(f"Rule {i+1} contains INLIER but should only contain OUTLIER: {rule}")
+                invalid_rules[CONTAINS_INLIER].append(number)
             
             # Check if rule follows the pattern "IF ... THEN OUTLIER"
             if not (rule.startswith("IF ") and "THEN OUTLIER" in rule):
-                errors.append(f"Rule {i+1} does not follow pattern 'IF ... THEN OUTLIER': {rule}")
+                invalid_rules[WRONG_PATTERN].append(number)
             
             # Check if rule contains "OR" (not allowed)
-            if " OR " in rule:
-                errors.append(f"Rule {i+1} contains 'OR' which is not allowed: {rule}")
+            if " OR " in rule.upper():
+                invalid_rules[CONTAINS_OR].append(number)
+        
+        # Report each kind of error once, listing all rules it applies to
+        for error, numbers in invalid_rules.items():
+            errors.append(f"Rule(s) {', '.join(map(str, numbers))}: {error}")
         
         # Additional check for comprehensiveness
         if not errors:
             # Check if all non-contradictory rules from the original sets are included
             # This is a complex task that would require deeper semantic analysis
             # For now, we'll just do basic checks on rule count and uniqueness
-            if self.rule_sets and len(self.rule_sets) > 0:
-                # Count total input outlier rules
-                total_outlier_rules = 0
-                for rule_set in self.rule_sets:
-                    if isinstance(rule_set, list):
-                        for rule in rule_set:
-                            if isinstance(rule, str) and "THEN OUTLIER" in rule:
-                                total_outlier_rules += 1
-                
-                # If we have significantly fewer rules than input, that might be an issue
-                # (unless many were contradictory or contained "OR" that got split)
-                if len(rules) < total_outlier_rules * 0.5 and total_outlier_rules > 2:
-                    errors.append(f"Warning: Output has significantly fewer rules ({len(rules)}) than expected. "
-                                 f"Make sure no valid rules were skipped.")
+            # If we have significantly fewer rules than input, that might be an issue
+            # (unless many were contradictory or contained "OR" that got split)
+            total_outlier_rules = self._expected_rule_count
+            if len(rules) < total_outlier_rules * 0.5 and total_outlier_rules > 2:
+                errors.append(f"Warning: Output has significantly fewer rules ({len(rules)}) than expected. "
+                             f"Make sure no valid rules were skipped.")
         
         return (len(errors) == 0), errors
     
-    def recursive_validate_and_fix(self, output_text):
+    def recursive_validate_and_fix(self, output_text, attempt=0):
         """
         Validate the rules and recursively fix them if needed.
+        Formatting issues are repaired locally; the LLM is only asked to fix
+        the remaining issues, at most MAX_FIX_ATTEMPTS times.
         Returns the validated rules.
         """
-        # Extract rules from the output
-        rules = self.extract_rules_from_output(output_text)
+        # Extract rules from the output and repair formatting issues
+        rules = self.repair_rules(self.extract_rules_from_output(output_text))
         
         # Validate the rules
         is_valid, errors = self.validate_rules(rules)
@@ -154,11 +385,15 @@ class RuleValidationAgent:
             error_msg = "\n".join(errors)
             print(f"Validation errors: {error_msg}")
             
+            if attempt >= MAX_FIX_ATTEMPTS:
+                print(f"Rules could not be fixed after {attempt} attempts.")
+                return []
+            
             # Create a new task to fix the issues
             new_task_description = (
                 f"Fix the following validation issues in the rules:\n{error_msg}\n\n"
                 f"Original task: {self.original_task_description}\n\n"
-                f"Current rules output:\n{json.dumps(rules, indent=2)}\n\n"
+                f"Current rules output:\n{orjson.dumps(rules, option=orjson.OPT_INDENT_2).decode()}\n\n"
                 f"Please provide a corrected set of rules that address all the validation issues."
                 f"Remember that ALL rules must:\n"
                 f"1. Follow the pattern 'IF ... THEN OUTLIER'\n"
@@ -175,29 +410,10 @@ class RuleValidationAgent:
                 agent=self.agent
             )
             
-            # Create a crew to fix the issues
-            crew_rule_fixer = Crew(
-                agents=[self.agent],
-                tasks=[fix_task],
-                llm=self.ai_model,
-                verbose=True,
-                process=Process.sequential
-            )
-            
-            # Kick off the crew
-            result = crew_rule_fixer.kickoff()
-            
-            # Handle the result
-            if isinstance(result, TaskOutput):
-                return self.recursive_validate_and_fix(result.raw)
-            elif isinstance(result, CrewOutput) and hasattr(result, 'output'):
-                if hasattr(result.output, 'raw'):
-                    return self.recursive_validate_and_fix(result.output.raw)
-                else:
-                    # Try best effort to get the output
-                    for output in result.outputs:
-                        if hasattr(output, 'raw'):
-                            return self.recursive_validate_and_fix(output.raw)
+            # Run the fix task directly on the agent, a crew adds nothing for a single task
+            result = self.agent.execute_task(fix_task)
+            if result:
+                return self.recursive_validate_and_fix(result, attempt + 1)
             
             # If we got here, we couldn't fix the issues, so return an empty list
             return []
@@ -208,17 +424,42 @@ class RuleValidationAgent:
             return rules
 
 
+class RuleMergeTask(ConditionalTask):
+    """
+    Conditional task whose output, when the task is skipped, holds the rules merged without the LLM.
+    """
+    
+    merged_output: Optional[TaskOutput] = None
+    
+    def get_skipped_task_output(self):
+        if self.merged_output is None:
+            return super().get_skipped_task_output()
+        
+        # Set the output, so that tasks using this one as context receive the merged rules
+        self.output = self.merged_output
+        return self.merged_output
+
+
 class ChiefQAEngineerWithTask:
     """
     Implementation of the Chief QA Engineer agent for validating and combining rule sets.
     Compatible with CrewAI framework.
     """
     
+    __slots__ = (
+        'llm', 'task_config', 'context', 'conservative_merge', 'validation',
+        'validator', 'agent', 'task'
+    )
+    
     def __init__(self, llm, task_config=None, context=None):
         # Store references for later
         self.llm = llm
-        self.task_config = task_config
+        self.task_config = task_config if task_config else {}
         self.context = context if context else []
+        # Merge structurally valid rule sets without the LLM, unless configured otherwise
+        self.conservative_merge = bool(self.task_config.get('conservative_merge', False))
+        # Future of the background validation started by the task callback
+        self.validation = None
         
         # Initialize agent and task
         self._initialize()
@@ -230,39 +471,35 @@ class ChiefQAEngineerWithTask:
         # Get the chief_qa_engineer details from agents.yaml
         role = "Chief Quality Assurance Engineer"
         goal = "Create rules set without any contradictions."
-        backstory = ("You have a background in both quality assurance and truck operation. "
-                    "You are intelligent being with knowledge about how to create rules set without any contradictions. "
-                    "You are known for your prudence, and you won't let any contradiction or skipped information slip through your fingers.")
+        # The merging guidelines are part of the backstory rather than the task description:
+        # they are static, so they form a cacheable prompt prefix and are not repeated in fix prompts
+        backstory = (
+            "You have a background in both quality assurance and truck operation. "
+            "You are intelligent being with knowledge about how to create rules set without any contradictions. "
+            "You are known for your prudence, and you won't let any contradiction or skipped information slip through your fingers.\n\n"
+            "When merging sets of rules into one set of rules, you follow this thought process:\n"
+            "1. Ensure the combined set of rules are consistent and comprehensive.\n"
+            "2. Ensure there are no inconsistencies in the combined set of rules.\n"
+            "3. Ensure there are no contradictions in the combined set of rules.\n"
+            "4. Ensure there is no skipped information in the combined set of rules, meaning under no circumstances "
+            "any rule should be skipped or not included in the final output, given particular rule is not contradictory/inconsistent.\n"
+            "5. Only rules describing given example being \"OUTLIER\" are to be saved. Rules for \"INLIER\" should be removed from the combined set.\n\n"
+            "Note that:\n"
+            "- Your task is to not modify particular rules under any circumstances\n"
+            "- You must not use \"OR\" under any circumstances, split the rules into separate ones in such case - follow example:\n\n"
+            "###EXAMPLE:\n"
+            "Incorrect: [\"IF Total no. compaction cycles > 100 AND (Total no. compaction cycles with p>100 bar < 10 OR Total fuel consumed [dm3] > 40) THEN OUTLIER\"]\n"
+            "Correct: [\"IF Total no. compaction cycles > 100 AND Total no. compaction cycles with p>100 bar < 10 THEN OUTLIER\", "
+            "\"IF Total no. compaction cycles > 100 AND Total fuel consumed [dm3] > 40 THEN OUTLIER\"]\n"
+            "###END OF EXAMPLE"
+        )
         
         # Initialize the rule sets from context if available
         rule_sets = self._extract_rule_sets_from_context()
         
-        # Create a task description based on the task config or use default
-        if self.task_config:
-            task_description = self.task_config.get('description', '')
-            expected_output = self.task_config.get('expected_output', '')
-        else:
-            # Default task description
-            task_description = (
-                "Given two provided sets of rules, merge the sets into one set of rules following this thought process:\n"
-                "1. Ensure the combined set of rules are consistent and comprehensive.\n"
-                "2. Ensure there are no inconsistencies in the combined set of rules.\n"
-                "3. Ensure there are no contradictions in the combined set of rules.\n"
-                "4. Ensure there is no skipped information in the combined set of rules, meaning under no circumstances "
-                "any rule should be skipped or not included in the final output, given particular rule is not contradictory/inconsistent.\n"
-                "5. Only rules describing given example being \"OUTLIER\" are to be saved. Rules for \"INLIER\" should be removed from the combined set.\n\n"
-                "Note that:\n"
-                "- Your task is to not modify particular rules under any circumstances\n"
-                "- You must not use \"OR\" under any circumstances, split the rules into separate ones in such case - follow example:\n\n"
-                "###EXAMPLE:\n"
-                "Incorrect: [\"IF Total no. compaction cycles > 100 AND (Total no. compaction cycles with p>100 bar < 10 OR Total fuel consumed [dm3] > 40) THEN OUTLIER\"]\n"
-                "Correct: [  \"IF Total no. compaction cycles > 100 AND Total no. compaction cycles with p>100 bar < 10 THEN OUTLIER\", \n"
-                "            \"IF Total no. compaction cycles > 100 AND Total fuel consumed [dm3] > 40 THEN OUTLIER\" ]\n"
-                "###END OF EXAMPLE\n\n"
-                f"Rule sets to combine: {json.dumps(rule_sets)}"
-            )
-            expected_output = ("Set of rules merged from two sets of rules, with no contradictions, "
-                              "inconsistencies or skipped information without any rules depicting \"INLIER\".")
+        # The task description and expected output come from the task config (tasks.yaml)
+        task_description = self.task_config.get('description', '')
+        expected_output = self.task_config.get('expected_output', '')
         
         # Create the validation agent
         self.validator = RuleValidationAgent(
@@ -279,8 +516,9 @@ class ChiefQAEngineerWithTask:
         # Store references to agent and task for CrewAI
         self.agent = self.validator.agent
         
-        # Create a new task with our callback
-        self.task = Task(
+        # Create a new task with our callback, executed only when the rule sets can't be merged locally
+        self.task = RuleMergeTask(
+            condition=self.requires_llm_merge,
             description=task_description,
             expected_output=expected_output,
             agent=self.agent,
@@ -300,8 +538,10 @@ class ChiefQAEngineerWithTask:
         for ctx in self.context:
             # Try to extract rules from the context
             if hasattr(ctx, 'output') and ctx.output:
-                # Try direct access to new_rules
-                if hasattr(ctx.output, 'new_rules'):
+                # Try direct access to new_rules of the structured output
+                if hasattr(ctx.output.pydantic, 'new_rules'):
+                    rule_sets.append(list(ctx.output.pydantic.new_rules))
+                elif hasattr(ctx.output, 'new_rules'):
                     rule_sets.append(ctx.output.new_rules)
                 # Try accessing output.raw
                 elif hasattr(ctx.output, 'raw'):
@@ -313,18 +553,94 @@ class ChiefQAEngineerWithTask:
                     if rules:
                         rule_sets.append(rules)
         
-        return rule_sets
+        # Drop rules that are already present in an earlier rule set
+        seen = set()
+        return [deduplicate_rules(rules, seen) for rules in rule_sets]
+    
+    def _has_structured_context(self):
+        """
+        Check whether all context tasks produced structured rule lists.
+        """
+        return bool(self.context) and all(
+            getattr(ctx, 'output', None) is not None and hasattr(ctx.output.pydantic, 'new_rules')
+            for ctx in self.context
+        )
+    
+    def requires_llm_merge(self, previous_output):
+        """
+        Condition of the task. Merges the rule sets from the context tasks locally
+        (deduplication, OR splitting, dropping INLIER rules) and returns whether the
+        agent still has to merge them: in conservative mode, when the context tasks
+        didn't produce structured rule lists, or when the merged rules are invalid
+        or contradictory.
+        """
+        # The context tasks have finished by now, so their rule sets are available
+        rule_sets = self._extract_rule_sets_from_context()
+        self.validator.rule_sets = rule_sets
+        
+        if self.conservative_merge or not self._has_structured_context():
+            return True
+        
+        merged_rules = self.validator.repair_rules([rule for rules in rule_sets for rule in rules])
+        is_valid, _ = self.validator.validate_rules(merged_rules)
+        if not is_valid:
+            return True
+        for rule in merged_rules:
+            match = RULE_PATTERN.match(rule)
+            if match is None or not is_satisfiable(match.group(1)):
+                return True
+        
+        self.validator.validated_rules = merged_rules
+        merged = {"new_rules": merged_rules}
+        self.task.merged_output = TaskOutput(
+            description=self.task.description,
+            expected_output=self.task.expected_output,
+            raw=orjson.dumps(merged).decode(),
+            json_dict=merged,
+            agent=self.agent.role,
+            output_format=OutputFormat.JSON
+        )
+        return False
     
     def callback(self, output):
         """
-        Callback function for the task. This processes the output from the agent,
-        validates and fixes it if necessary, and returns it in the expected format.
+        Callback function for the task. This starts validating and, if necessary,
+        fixing the output from the agent in the background, so that the crew can
+        go on handling the finished task. The task that consumes the output must
+        call wait_for_validation before reading it.
         """
         if output is None:
-            return {"new_rules": []}
+            self.validation = None
+            return
         
+        self.validation = VALIDATION_EXECUTOR.submit(self._validate_output, output)
+    
+    def _validate_output(self, output):
+        """
+        Validate and fix the rules of the task output. CrewAI ignores the return value
+        of task callbacks, so the validated rules replace the task output, which the
+        formatting task receives as context. The output is left unchanged if the rules
+        could not be fixed.
+        """
         # Use the validator to recursively validate and fix the rules
         validated_rules = self.validator.recursive_validate_and_fix(output.raw)
+        if not validated_rules:
+            return
         
-        # Return the validated rules in the correct format
-        return {"new_rules": validated_rules}
\ No newline at end of file
+        # Replace the output with the validated rules in the expected format
+        validated = {"new_rules": validated_rules}
+        output.raw = orjson.dumps(validated).decode()
+        output.json_dict = validated
+        output.output_format = OutputFormat.JSON
+    
+    def wait_for_validation(self, previous_output=None):
+        """
+        Wait for the background validation of the task output, re-raising its errors.
+        Used as the condition of the formatting task: the crew evaluates it before
+        building the task's context, so the context holds the validated rules.
+        Always returns True, so that the task is executed.
+        """
+        validation, self.validation = self.validation, None
+        if validation is not None:
+            validation.result()
+        return True
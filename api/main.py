@@ -7,23 +7,32 @@ This module provides a FastAPI application with endpoints for:
 - Integrating expert rules with machine learning models
 """
 
-from fastapi import FastAPI, HTTPException, Depends, Path, status
+from fastapi import FastAPI, HTTPException, Path, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 from enum import Enum
 import redis
+import msgspec
+from cachetools import TTLCache
 import uuid
+from celery import chain
 import logging
-import json
 import traceback
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import os
+import base64
+import pandas as pd
 
 os.environ["OTEL_SDK_DISABLED"] = "true"
 
 from utils.tasks import outlier_detection_from_data, extract_and_integrate_expert_rules
-from utils.redis import redis_connection
+from utils.redis import (
+    loads, dumps_dataframe, task_key, image_key, processing_key,
+    PROCESSING_MARKER_TTL, TASK_DATA_PREFIX, OUTLIER_RESULTS_PREFIX, INTEGRATED_RESULTS_PREFIX
+)
+from utils.redis_async import async_redis_connection
 
 # Configure logging
 logging.basicConfig(
@@ -33,9 +42,13 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Define constants
-REDIS_TASK_DATA_DB = 1
-REDIS_OUTLIER_RESULTS_DB = 2
-REDIS_INTEGRATED_RESULTS_DB = 4
+# Finished results don't change, so repeated requests for them are served from memory
+TASK_DATA_CACHE_SIZE = 128
+TASK_DATA_CACHE_TTL = 60  # seconds
+task_data_cache = TTLCache(maxsize=TASK_DATA_CACHE_SIZE, ttl=TASK_DATA_CACHE_TTL)
+
+# Seconds clients are asked to wait before polling a task that is still processing again
+RETRY_AFTER = 2
 
 
 class OutlierDetectionAlgorithm(str, Enum):
@@ -66,6 +79,11 @@ class RegisterTaskRequest(BaseModel):
         ..., 
         description="Expert knowledge text to integrate with the rules"
     )
+    n_estimators: Optional[int] = Field(
+        None,
+        ge=1,
+        description="Number of trees for IsolationForest; fewer trees are faster but less accurate"
+    )
     # Changed from Dict[str, List[Any]] back to dict for backward compatibility
     json_dict: dict = Field(
         ..., 
@@ -121,6 +139,7 @@ app = FastAPI(
     docs_url="/api/docs",
     redoc_url="/api/redoc",
     openapi_url="/api/openapi.json",
+    default_response_class=ORJSONResponse,
 )
 
 # Add CORS middleware
@@ -134,8 +153,8 @@ app.add_middleware(
 
 
 async def get_task_data(
-    task_id: str = Path(..., description="Unique task identifier"),
-    db: int = REDIS_OUTLIER_RESULTS_DB,
+    task_id: str,
+    prefix: str = OUTLIER_RESULTS_PREFIX,
     skip_check: bool = False
 ) -> Dict[str, Any]:
     """
@@ -143,46 +162,140 @@ async def get_task_data(
     
     Args:
         task_id: The unique identifier for the task
-        db: The Redis database to retrieve from
+        prefix: Key prefix of the processing stage to retrieve the results of
         skip_check: Whether to skip the task status check
         
     Returns:
         The task data dictionary
         
     Raises:
-        HTTPException: If task is not found or not completed
+        HTTPException: If task is not found, not completed or failed
     """
+    cache_key = task_key(prefix, task_id)
+    task = task_data_cache.get(cache_key)
+    if task is not None:
+        return task
+    
     try:
-        with redis_connection(db=db) as r:
-            task_data = r.get(task_id)
+        async with async_redis_connection() as r:
+            pipe = r.pipeline(transaction=False)
+            pipe.exists(processing_key(prefix, task_id))
+            pipe.get(cache_key)
+            processing, task_data = await pipe.execute()
+            if processing:
+                raise HTTPException(
+                    status_code=status.HTTP_202_ACCEPTED,
+                    detail="Task is still processing",
+                    headers={"Retry-After": str(RETRY_AFTER)}
+                )
             if not task_data:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND, 
                     detail="Task not found or task not finished yet"
                 )
-            task = json.loads(task_data)
+            task = loads(task_data)
     except redis.exceptions.RedisError as exc:
         logger.error(f"Redis error for task {task_id}: {traceback.format_exc()}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to retrieve task data from database"
         )
-    except json.JSONDecodeError:
-        logger.error(f"Invalid JSON data for task {task_id}")
+    except msgspec.DecodeError:
+        logger.error(f"Invalid data for task {task_id}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Invalid task data format"
         )
     
+    # Results are only stored once a task has finished, so any other status is a failure
     if not skip_check and task.get('status') != 'success':
         raise HTTPException(
-            status_code=status.HTTP_202_ACCEPTED, 
-            detail="Task is still processing"
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Task failed: {task.get('error', 'unknown error')}"
         )
     
+    # Only successful results are final; others may still be overwritten
+    if task.get('status') == 'success':
+        task_data_cache[cache_key] = task
+    
     return task
 
 
+async def get_task_images(
+    task_id: str,
+    prefix: str = OUTLIER_RESULTS_PREFIX
+) -> Dict[str, Any]:
+    """
+    Retrieve the visualizations of a finished task from Redis.
+    
+    Args:
+        task_id: The unique identifier for the task
+        prefix: Key prefix of the processing stage to retrieve the visualizations of
+        
+    Returns:
+        Dictionary of the task's visualizations, empty if there are none
+        
+    Raises:
+        HTTPException: If task is not found or not completed
+    """
+    # The images are stored together with the results, so they exist once the task has finished
+    await get_task_data(task_id=task_id, prefix=prefix)
+    
+    cache_key = image_key(prefix, task_id)
+    images = task_data_cache.get(cache_key)
+    if images is not None:
+        return images
+    
+    try:
+        async with async_redis_connection() as r:
+            image_data = await r.get(cache_key)
+        images = loads(image_data) if image_data else {}
+    except redis.exceptions.RedisError:
+        logger.error(f"Redis error for task {task_id}: {traceback.format_exc()}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to retrieve task data from database"
+        )
+    except msgspec.DecodeError:
+        logger.error(f"Invalid image data for task {task_id}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Invalid task data format"
+        )
+    
+    task_data_cache[cache_key] = images
+    return images
+
+
+def image_url(images: Dict[str, Any]) -> str:
+    """Return the PNG visualization of a task as a base64 data URL, or an empty string if there is none."""
+    image_png = images.get('image_png')
+    if not image_png:
+        return ""
+    return f"data:image/png;base64,{base64.b64encode(image_png).decode('ascii')}"
+
+
+def image_response(images: Dict[str, Any], field: str, media_type: str) -> Response:
+    """
+    Build a response with a visualization of a task.
+    
+    Args:
+        images: The task's visualizations
+        field: The visualization to return
+        media_type: Media type of the visualization
+        
+    Raises:
+        HTTPException: If no visualization is available
+    """
+    image = images.get(field)
+    if not image:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No image available for this task"
+        )
+    return Response(content=image, media_type=media_type)
+
+
 @app.post(
     "/register_data/", 
     response_model=RegisteredTaskResponse, 
@@ -197,7 +310,7 @@ async def register_data(request: RegisterTaskRequest) -> RegisteredTaskResponse:
     """
     Register data for outlier detection and rule integration.
     
-    This endpoint starts an asynchronous process that:
+    This endpoint queues an asynchronous process that:
     1. Performs outlier detection using the specified algorithm
     2. Integrates expert rules with the detection results
     
@@ -206,9 +319,28 @@ async def register_data(request: RegisterTaskRequest) -> RegisteredTaskResponse:
     task_id = str(uuid.uuid4())
     logger.info(f"Registering new task {task_id} with {request.data_algorithm} and {request.rules_algorithm}")
     
+    # Convert the dataset once here; the tasks load the stored table directly
     try:
-        with redis_connection(db=REDIS_TASK_DATA_DB) as r:
-            r.set(task_id, request.model_dump_json())
+        dataset = await run_in_threadpool(lambda: dumps_dataframe(pd.DataFrame(request.json_dict)))
+    except Exception:
+        logger.error(f"Dataset conversion failed for task {task_id}: {traceback.format_exc()}")
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Dataset could not be converted to a table"
+        )
+    
+    # Stored as a hash, so that each processing stage can read only the fields it needs
+    task = request.model_dump(mode="json", exclude={"json_dict"}, exclude_none=True)
+    task["dataset"] = dataset
+    
+    try:
+        async with async_redis_connection() as r:
+            # Mark the results of both processing stages as pending until the tasks store them
+            pipe = r.pipeline()
+            pipe.hset(task_key(TASK_DATA_PREFIX, task_id), mapping=task)
+            for prefix in (OUTLIER_RESULTS_PREFIX, INTEGRATED_RESULTS_PREFIX):
+                pipe.set(processing_key(prefix, task_id), "processing", ex=PROCESSING_MARKER_TTL)
+            await pipe.execute()
     except redis.exceptions.RedisError:
         logger.error(f"Redis error during task registration: {traceback.format_exc()}")
         raise HTTPException(
@@ -217,10 +349,14 @@ async def register_data(request: RegisterTaskRequest) -> RegisteredTaskResponse:
         )
 
     try:
-        # Start processing in background (in a real production system, 
-        # this would use a task queue like Celery)
-        outlier_detection_from_data(task_id)
-        extract_and_integrate_expert_rules(task_id)
+        # Queue processing for the Celery workers; rule integration uses the
+        # outlier detection results, so it runs after it
+        # (publishing to the broker is blocking, so it is done off the event loop)
+        pipeline = chain(
+            outlier_detection_from_data.si(task_id),
+            extract_and_integrate_expert_rules.si(task_id)
+        )
+        await run_in_threadpool(pipeline.apply_async)
     except Exception:
         logger.error(f"Error starting task processing: {traceback.format_exc()}")
         raise HTTPException(
@@ -243,10 +379,51 @@ async def register_data(request: RegisterTaskRequest) -> RegisteredTaskResponse:
     description="Retrieve the decision tree visualization from the outlier detection process"
 )
 async def get_outliers_from_data_image(
-    task_data: Dict[str, Any] = Depends(get_task_data)
+    task_id: str = Path(..., description="Unique task identifier")
 ) -> ImageResponse:
     """Get the visualization image for outlier detection results."""
-    return ImageResponse(image_url=task_data.get('image_url', ''))
+    images = await get_task_images(task_id=task_id, prefix=OUTLIER_RESULTS_PREFIX)
+    return ImageResponse(image_url=image_url(images))
+
+
+@app.get(
+    "/tasks/{task_id}/outliers_from_data_img.svg", 
+    response_class=Response,
+    responses={
+        200: {"content": {"image/svg+xml": {}}},
+        404: {"model": ErrorResponse},
+        500: {"model": ErrorResponse},
+        202: {"model": ErrorResponse}
+    },
+    summary="Get SVG visualization of outlier detection results",
+    description="Retrieve the decision tree visualization from the outlier detection process as an SVG document"
+)
+async def get_outliers_from_data_svg(
+    task_id: str = Path(..., description="Unique task identifier")
+) -> Response:
+    """Get the SVG visualization for outlier detection results."""
+    images = await get_task_images(task_id=task_id, prefix=OUTLIER_RESULTS_PREFIX)
+    return image_response(images, 'image_svg', "image/svg+xml")
+
+
+@app.get(
+    "/tasks/{task_id}/outliers_from_data_img.png", 
+    response_class=Response,
+    responses={
+        200: {"content": {"image/png": {}}},
+        404: {"model": ErrorResponse},
+        500: {"model": ErrorResponse},
+        202: {"model": ErrorResponse}
+    },
+    summary="Get PNG visualization of outlier detection results",
+    description="Retrieve the decision tree visualization from the outlier detection process as a PNG image"
+)
+async def get_outliers_from_data_png(
+    task_id: str = Path(..., description="Unique task identifier")
+) -> Response:
+    """Get the PNG visualization for outlier detection results."""
+    images = await get_task_images(task_id=task_id, prefix=OUTLIER_RESULTS_PREFIX)
+    return image_response(images, 'image_png', "image/png")
 
 
 @app.get(
@@ -261,9 +438,10 @@ async def get_outliers_from_data_image(
     description="Retrieve the rules extracted from the outlier detection model"
 )
 async def get_outliers_from_data_rules(
-    task_data: Dict[str, Any] = Depends(get_task_data)
+    task_id: str = Path(..., description="Unique task identifier")
 ) -> RuleListResponse:
     """Get the rules extracted from outlier detection."""
+    task_data = await get_task_data(task_id=task_id, prefix=OUTLIER_RESULTS_PREFIX)
     return RuleListResponse(rules=task_data.get('rules', []))
 
 
@@ -282,8 +460,48 @@ async def get_outliers_integrated_image(
     task_id: str = Path(..., description="Unique task identifier")
 ) -> ImageResponse:
     """Get the visualization image for integrated outlier rules."""
-    task_data = await get_task_data(task_id=task_id, db=REDIS_INTEGRATED_RESULTS_DB)
-    return ImageResponse(image_url=task_data.get('image_url', ''))
+    images = await get_task_images(task_id=task_id, prefix=INTEGRATED_RESULTS_PREFIX)
+    return ImageResponse(image_url=image_url(images))
+
+
+@app.get(
+    "/tasks/{task_id}/outliers_integrated_img.svg", 
+    response_class=Response,
+    responses={
+        200: {"content": {"image/svg+xml": {}}},
+        404: {"model": ErrorResponse},
+        500: {"model": ErrorResponse},
+        202: {"model": ErrorResponse}
+    },
+    summary="Get SVG visualization of integrated rules",
+    description="Retrieve the decision tree visualization after expert rule integration as an SVG document"
+)
+async def get_outliers_integrated_svg(
+    task_id: str = Path(..., description="Unique task identifier")
+) -> Response:
+    """Get the SVG visualization for integrated outlier rules."""
+    images = await get_task_images(task_id=task_id, prefix=INTEGRATED_RESULTS_PREFIX)
+    return image_response(images, 'image_svg', "image/svg+xml")
+
+
+@app.get(
+    "/tasks/{task_id}/outliers_integrated_img.png", 
+    response_class=Response,
+    responses={
+        200: {"content": {"image/png": {}}},
+        404: {"model": ErrorResponse},
+        500: {"model": ErrorResponse},
+        202: {"model": ErrorResponse}
+    },
+    summary="Get PNG visualization of integrated rules",
+    description="Retrieve the decision tree visualization after expert rule integration as a PNG image"
+)
+async def get_outliers_integrated_png(
+    task_id: str = Path(..., description="Unique task identifier")
+) -> Response:
+    """Get the PNG visualization for integrated outlier rules."""
+    images = await get_task_images(task_id=task_id, prefix=INTEGRATED_RESULTS_PREFIX)
+    return image_response(images, 'image_png', "image/png")
 
 
 @app.get(
@@ -302,7 +520,7 @@ async def get_outliers_integrated_rules(
     """Get the integrated rules from expert knowledge and outlier detection."""
     task_data = await get_task_data(
         task_id=task_id, 
-        db=REDIS_INTEGRATED_RESULTS_DB, 
+        prefix=INTEGRATED_RESULTS_PREFIX, 
         skip_check=True
     )
     return RuleListResponse(rules=task_data.get('rules_integrated', []))
@@ -324,7 +542,7 @@ async def get_outliers_new_rules(
     """Get the new rules extracted from the integrated model."""
     task_data = await get_task_data(
         task_id=task_id, 
-        db=REDIS_INTEGRATED_RESULTS_DB, 
+        prefix=INTEGRATED_RESULTS_PREFIX, 
         skip_check=True
     )
     return RuleListResponse(rules=task_data.get('new_rules', []))
@@ -334,7 +552,7 @@ async def get_outliers_new_rules(
 async def generic_exception_handler(request, exc):
     """Handle unexpected exceptions and return a clean error response."""
     logger.error(f"Unhandled exception: {traceback.format_exc()}")
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={"detail": "An unexpected error occurred"}
     )
@@ -0,0 +1,50 @@
+"""
+Celery application for the outlier detection and rule integration pipeline.
+
+The API only enqueues tasks; they are executed by a separate worker process:
+
+    celery -A utils.celery_app worker --loglevel=info
+
+Redis is used both as the message broker and as the result backend, in
+databases other than the one holding the task data.
+"""
+
+import os
+from urllib.parse import quote
+
+from celery import Celery
+
+# Define constants
+REDIS_BROKER_DB = 0
+REDIS_BACKEND_DB = 3
+
+
+def redis_url(db: int) -> str:
+    """
+    Build the URL of a Redis database from the same settings used by redis_connection.
+    
+    Args:
+        db: The Redis database number
+        
+    Returns:
+        Redis connection URL
+    """
+    password = os.environ.get("REDIS_PASSWORD")
+    credentials = f"default:{quote(password, safe='')}@" if password else ""
+    return f"redis://{credentials}{os.environ.get('REDIS_ADDRESS')}:6379/{db}"
+
+
+celery_app = Celery(
+    "odagents",
+    broker=redis_url(REDIS_BROKER_DB),
+    backend=redis_url(REDIS_BACKEND_DB),
+    include=["utils.tasks"],
+)
+
+celery_app.conf.update(
+    task_serializer="json",
+    result_serializer="json",
+    accept_content=["json"],
+    # Tasks take minutes (model fitting, LLM calls), so workers take one at a time
+    worker_prefetch_multiplier=1,
+)
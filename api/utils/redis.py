@@ -1,22 +1,117 @@
-import json
+import msgspec
+import pandas as pd
+import pyarrow as pa
 import redis
+import socket
 from contextlib import contextmanager
+from functools import lru_cache
 import os
 
-@contextmanager
-def redis_connection(db: int):
-    r = redis.Redis(
+# Maximum number of connections kept open per database
+REDIS_MAX_CONNECTIONS = 32
+# Seconds to wait for a free connection when all of them are in use
+REDIS_POOL_TIMEOUT = 5
+
+# Keep idle pooled connections alive, so that they aren't silently dropped by the network
+SOCKET_KEEPALIVE_OPTIONS = {
+    option: value
+    for option, value in (
+        (getattr(socket, 'TCP_KEEPIDLE', None), 30),
+        (getattr(socket, 'TCP_KEEPINTVL', None), 10),
+        (getattr(socket, 'TCP_KEEPCNT', None), 3),
+    )
+    if option is not None
+}
+
+
+def connection_pool_kwargs(db: int) -> dict:
+    """Return the settings shared by the sync and asyncio connection pools of a database."""
+    return dict(
         host=os.environ.get("REDIS_ADDRESS"),
         port=6379,
         username="default",
         password=os.environ.get("REDIS_PASSWORD"),
         db=db,
-        socket_timeout=5  # Avoid hanging indefinitely
+        max_connections=REDIS_MAX_CONNECTIONS,
+        timeout=REDIS_POOL_TIMEOUT,
+        socket_timeout=5,  # Avoid hanging indefinitely
+        socket_keepalive=True,
+        socket_keepalive_options=SOCKET_KEEPALIVE_OPTIONS,
+        health_check_interval=30  # Check connections that were idle for a while before reusing them
     )
-    try:
-        yield r
-    finally:
-        r.close()
 
-def serialize_list(list_):
-    return json.dumps(list_)
\ No newline at end of file
+
+# All task state is kept in one database, under a key prefix per processing stage
+REDIS_DB = 1
+TASK_DATA_PREFIX = "task"
+OUTLIER_RESULTS_PREFIX = "out"
+INTEGRATED_RESULTS_PREFIX = "int"
+# Processing markers expire, so that tasks lost by a worker don't stay "processing" forever
+PROCESSING_MARKER_TTL = 3600  # seconds
+
+
+def task_key(prefix: str, task_id: str) -> str:
+    """Key of the data of a task for one processing stage."""
+    return f"{prefix}:{task_id}"
+
+
+def image_key(prefix: str, task_id: str) -> str:
+    """Key of the visualizations of a task, next to its results."""
+    return f"{prefix}:{task_id}:img"
+
+
+def processing_key(prefix: str, task_id: str) -> str:
+    """Key of the marker that is set while the results of a processing stage are being computed."""
+    return f"{prefix}:{task_id}:processing"
+
+
+def dataframe_key(task_id: str) -> str:
+    """Key of the cleaned dataset of a task, shared by the processing stages."""
+    return f"{OUTLIER_RESULTS_PREFIX}:{task_id}:df"
+
+
+# Values are stored in Redis as MessagePack
+_encoder = msgspec.msgpack.Encoder()
+_decoder = msgspec.msgpack.Decoder()
+
+dumps = _encoder.encode
+loads = _decoder.decode
+
+
+def dumps_table(table: pa.Table) -> bytes:
+    """Serialize an Arrow table to IPC stream bytes."""
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def loads_table(data: bytes) -> pa.Table:
+    """Deserialize an Arrow table written by dumps_table."""
+    return pa.ipc.open_stream(data).read_all()
+
+
+def dumps_dataframe(df: pd.DataFrame) -> bytes:
+    """Serialize a DataFrame, including its index, to Arrow IPC stream bytes."""
+    return dumps_table(pa.Table.from_pandas(df))
+
+
+def loads_dataframe(data: bytes) -> pd.DataFrame:
+    """Deserialize a DataFrame written by dumps_dataframe."""
+    return loads_table(data).to_pandas()
+
+
+@lru_cache(maxsize=None)
+def get_redis_client(db: int) -> redis.Redis:
+    """
+    Return the shared client of a Redis database.
+    Connections are pooled and reused across calls instead of being opened for every operation.
+    """
+    pool = redis.BlockingConnectionPool(**connection_pool_kwargs(db))
+    return redis.Redis(connection_pool=pool)
+
+
+@contextmanager
+def redis_connection(db: int = REDIS_DB):
+    # The client is shared, so it is not closed when leaving the context
+    yield get_redis_client(db)
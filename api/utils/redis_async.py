@@ -0,0 +1,21 @@
+import redis.asyncio
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+from utils.redis import REDIS_DB, connection_pool_kwargs
+
+
+@lru_cache(maxsize=None)
+def get_async_redis_client(db: int) -> redis.asyncio.Redis:
+    """
+    Return the shared asyncio client of a Redis database, for use in the API's event loop.
+    Connections are pooled and reused across calls instead of being opened for every operation.
+    """
+    pool = redis.asyncio.BlockingConnectionPool(**connection_pool_kwargs(db))
+    return redis.asyncio.Redis(connection_pool=pool)
+
+
+@asynccontextmanager
+async def async_redis_connection(db: int = REDIS_DB):
+    # The client is shared, so it is not closed when leaving the context
+    yield get_async_redis_client(db)
@@ -1,55 +1,107 @@
 import re
+from functools import lru_cache
+import numpy as np
 import pandas as pd
 from typing import Optional
 
-def apply_rules_to_dataset(rules, df) -> pd.DataFrame:
+# Leading 'IF' of a condition
+IF_PATTERN = re.compile(r'IF\s*(.*)', re.IGNORECASE)
+# Single condition with the parameter between $...$, operator, and value, e.g. '$Distance [km]$ > 135.750'
+CONDITION_PATTERN = re.compile(r'\$(.*?)\$\s*(>=|<=|>|<|==)\s*([\d\.]+)\s*(km/h|bar|km|h|dm3|l|kg|t|rpm|liters|kilograms|tons)?')
+
+# From this number of rows, rules are evaluated as one numexpr expression instead of
+# condition by condition; below it the expression compilation costs more than it saves
+NUMEXPR_MIN_ROWS = 10_000
+
+COMPARISONS = {
+    '>': np.greater,
+    '<': np.less,
+    '>=': np.greater_equal,
+    '<=': np.less_equal,
+    '==': np.equal,
+}
+
+
+def parse_condition(cond):
+    # Example: '$truck speed$ > 120 km/h'
+    match = IF_PATTERN.match(cond.strip())
+    c = match.group(1) if match else cond
+    return c.strip()
+
+
+@lru_cache(maxsize=256)
+def parse_rules(rules: tuple) -> tuple:
     """
-    Applies the given rules to the DataFrame and returns a new column 'rule_outlier'.
+    Parse outlier rules into tuples of (column, operator, value) conditions.
+    Rules without 'THEN OUTLIER' are left out; conditions that can't be parsed are skipped,
+    so a rule without any parsed condition matches every row.
+    Takes and returns tuples, so that the result of parsing the same rules is reused.
     """
-    df['outlier'] = False
-    
-    def parse_condition(cond):
-        # Example: '$truck speed$ > 120 km/h'
-        match = re.match(r'IF\s*(.*)', cond.strip(), re.IGNORECASE)
-        c = match.group(1) if match else cond
-        return c.strip()
-    
-    # Process each rule
+    parsed = []
     for rule in rules:
         if 'THEN OUTLIER' not in rule:
             continue
         cond_part, _ = rule.split('THEN OUTLIER')
         cond_part = cond_part.replace('IF', '').strip()
-        conditions = [parse_condition(c) for c in cond_part.split('AND')]
         
-        # Build mask for the current rule
-        mask = pd.Series([True]*len(df), index=df.index)
-        for c in conditions:
-            # Extract param between $...$, operator, and value
-            # e.g. '$Distance [km]$ > 135.750'
-            pattern = r'\$(.*?)\$\s*(>=|<=|>|<|==)\s*([\d\.]+)\s*(km/h|bar|km|h|dm3|l|kg|t|rpm|liters|kilograms|tons)?'
-            match = re.search(pattern, c)
+        conditions = []
+        for c in cond_part.split('AND'):
+            match = CONDITION_PATTERN.search(parse_condition(c))
             if not match:
                 continue
             col, op, val, _ = match.groups()
-            col = col.strip()
-            val = float(val)
+            conditions.append((col.strip(), op, float(val)))
+        parsed.append(tuple(conditions))
+    
+    return tuple(parsed)
+
+
+def eval_rule(conditions, df) -> Optional[np.ndarray]:
+    """
+    Evaluate the conditions of a rule as a single expression with numexpr.
+    Returns None if the expression can't be evaluated this way (e.g. for non-numeric columns
+    or when numexpr isn't installed), in which case the conditions have to be evaluated one by one.
+    """
+    expression = " & ".join(f"(`{col}` {op} {val!r})" for col, op, val in conditions)
+    try:
+        return df.eval(expression, engine='numexpr').to_numpy(dtype=bool)
+    except Exception:
+        return None
 
-            if op == '>':
-                mask &= df[col] > val
-            elif op == '<':
-                mask &= df[col] < val
-            elif op == '>=':
-                mask &= df[col] >= val
-            elif op == '<=':
-                mask &= df[col] <= val
-            elif op == '==':
-                mask &= df[col] == val
 
-        df.loc[mask, 'outlier'] = True
+def apply_rules_to_dataset(rules, df) -> pd.DataFrame:
+    """
+    Applies the given rules to the DataFrame and returns a new column 'rule_outlier'.
+    """
+    df['outlier'] = False
+    
+    # Column values are extracted once and shared by all rules
+    columns = {}
+    outlier = np.zeros(len(df), dtype=bool)
+    mask = np.empty(len(df), dtype=bool)
+    
+    use_numexpr = len(df) >= NUMEXPR_MIN_ROWS
+    
+    for conditions in parse_rules(tuple(rules)):
+        if use_numexpr and conditions and all('`' not in col for col, _, _ in conditions):
+            rule_mask = eval_rule(conditions, df)
+            if rule_mask is not None:
+                outlier |= rule_mask
+                continue
         
+        # Build mask for the current rule
+        mask.fill(True)
+        for col, op, val in conditions:
+            if col not in columns:
+                columns[col] = df[col].to_numpy()
+            np.logical_and(mask, COMPARISONS[op](columns[col], val), out=mask)
+        
+        outlier |= mask
+    
+    df['outlier'] = outlier
     return df
 
+
 def test_rules():
     data = {
         "truck speed": [100, 130, 90],
@@ -8,15 +8,17 @@ This module provides functions for:
 - Integrating expert knowledge with detected outliers
 """
 
-import base64
 import logging
-import json
+import orjson
+import re
 import traceback
 from io import BytesIO
 from typing import Tuple, List, Dict, Any, Union, Optional
 
-import pandas as pd
+import numpy as np
+import pyarrow as pa
 import matplotlib.pyplot as plt
+from celery.exceptions import SoftTimeLimitExceeded
 from crewai.crew import CrewOutput
 
 # Configure matplotlib
@@ -26,11 +28,18 @@ plt.switch_backend('Agg')
 from sklearn.neighbors import LocalOutlierFactor
 from sklearn.ensemble import IsolationForest
 from sklearn.svm import OneClassSVM
+from sklearn.tree import BaseDecisionTree, export_graphviz
+import graphviz
 from imodels import FIGSClassifier, OptimalTreeClassifier, GreedyTreeClassifier
 
 # Local imports
-from utils.redis import serialize_list, redis_connection
-from utils.tree_utils_figs import create_tree, extract_rules, trunc_output
+from utils.redis import (
+    redis_connection, dumps, loads, dumps_table, loads_table, loads_dataframe,
+    task_key, image_key, dataframe_key, processing_key,
+    TASK_DATA_PREFIX, OUTLIER_RESULTS_PREFIX, INTEGRATED_RESULTS_PREFIX
+)
+from utils.celery_app import celery_app
+from utils.tree_utils_figs import extract_rules_from_lines, trunc_lines
 from utils.tree_utils import parse_tree_to_rules
 from utils.rules_utils import apply_rules_to_dataset
 from crew.crew import RulesExtractionAndIntegrationCrew
@@ -43,17 +52,30 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Define constants
-REDIS_TASK_DATA_DB = 1
-REDIS_OUTLIER_RESULTS_DB = 2
-REDIS_INTEGRATED_RESULTS_DB = 4
 
+# Resolution of the rendered decision trees; higher values mostly add render time and size
+IMAGE_DPI = 150
+
+# Feature placeholders in the rules of trees fitted without feature names, e.g. 'feature_3'
+FEATURE_PATTERN = re.compile(r'feature_(\d+)')
+
+# Result fields holding visualizations; they are stored apart from the rest of the results
+IMAGE_FIELDS = ("image_png", "image_svg")
+
+# Seconds a task may run. The soft limit raises SoftTimeLimitExceeded in the task first,
+# so that a failed result is stored and the processing marker is cleared before the
+# worker process is killed at the hard limit.
+TASK_TIME_LIMIT = 600
+TASK_SOFT_TIME_LIMIT = 570
 
-def load_outlier_model(data_algorithm: str) -> Tuple[Any, str]:
+
+def load_outlier_model(data_algorithm: str, n_estimators: Optional[int] = None) -> Tuple[Any, str]:
     """
     Load the appropriate outlier detection model based on algorithm name.
     
     Args:
         data_algorithm: Name of the outlier detection algorithm to use
+        n_estimators: Number of trees for IsolationForest, the scikit-learn default if None
         
     Returns:
         Tuple containing:
@@ -65,10 +87,14 @@ def load_outlier_model(data_algorithm: str) -> Tuple[Any, str]:
     model = None
     
     try:
+        # Neighbor searches and trees are computed on all cores
         if data_algorithm == 'LocalOutlierFactor':
-            model = LocalOutlierFactor()
+            model = LocalOutlierFactor(n_jobs=-1)
         elif data_algorithm == 'IsolationForest':
-            model = IsolationForest()
+            if n_estimators is None:
+                model = IsolationForest(n_jobs=-1)
+            else:
+                model = IsolationForest(n_estimators=n_estimators, n_jobs=-1)
         elif data_algorithm == 'OneClassSVM':
             model = OneClassSVM()
         else:
@@ -117,7 +143,7 @@ def load_model(rules_algorithm: str) -> Tuple[Any, str]:
 def extract_rules_from_model(
     model: Any, 
     rules_algorithm: str, 
-    df: pd.DataFrame
+    feature_names: List[str]
 ) -> Tuple[List[str], str]:
     """
     Extract rules from a fitted model.
@@ -125,7 +151,7 @@ def extract_rules_from_model(
     Args:
         model: Fitted model object
         rules_algorithm: Name of the rules algorithm used
-        df: DataFrame with feature names
+        feature_names: Names of the features the model was fitted on
         
     Returns:
         Tuple containing:
@@ -137,20 +163,15 @@ def extract_rules_from_model(
     
     try:
         if rules_algorithm == 'FIGS':
-            tree_data = trunc_output(str(model)).split('\n')
-            root = create_tree(tree_data)
-            extract_rules(root, rule_list, '')
+            extract_rules_from_lines(trunc_lines(str(model)), rule_list)
         else:
-            # OptimalTree and GreedyTree handling
-            columns = df.columns.tolist()
-            tree_data = str(model)
-            feature_no_to_column = {f"feature_{i}": columns[i] for i in range(len(columns))}
-
-            rule_list_raw_feature = parse_tree_to_rules(tree_data)
-            for rule in rule_list_raw_feature:
-                for k, v in feature_no_to_column.items():
-                    rule = rule.replace(k, v)
-                rule_list.append(rule)
+            # OptimalTree and GreedyTree name features by their index, e.g. feature_0
+            def feature_name(match: re.Match) -> str:
+                index = int(match.group(1))
+                return feature_names[index] if index < len(feature_names) else match.group(0)
+
+            for rule in parse_tree_to_rules(str(model)):
+                rule_list.append(FEATURE_PATTERN.sub(feature_name, rule))
                 
     except Exception as exc:
         logger.error(f"Rule extraction failed: {exc}", exc_info=True)
@@ -159,44 +180,66 @@ def extract_rules_from_model(
     return rule_list, status
 
 
-def generate_model_image(model: Any) -> Tuple[Optional[str], str]:
+def generate_model_images(model: Any, feature_names: List[str]) -> Tuple[Optional[bytes], Optional[bytes]]:
     """
-    Generate a visualization of the model's decision tree.
+    Generate PNG and SVG visualizations of the model's decision tree.
+    
+    The model's plot method is called once. Trees based on scikit-learn's are
+    rendered to SVG with Graphviz; for other models the SVG is saved from the
+    same figure as the PNG. The figure is closed afterwards, so that it doesn't
+    stay open in the long-running worker.
     
     Args:
         model: Fitted model object
+        feature_names: Names of the features the model was fitted on
         
     Returns:
         Tuple containing:
-            - Base64 encoded image string or None if failed
-            - Status string ('success' or 'failed')
+            - PNG image bytes or None if failed
+            - SVG document bytes or None if failed
     """
-    status = 'success'
-    image_base64 = None
+    image_png = None
+    image_svg = None
+    use_graphviz = isinstance(model, BaseDecisionTree)
     
     try:
         img_buffer = BytesIO()
-        model.plot(filename=img_buffer, dpi=600)
-        img_buffer.seek(0)
-        image_base64 = base64.b64encode(img_buffer.getvalue()).decode('utf-8')
+        model.plot(filename=img_buffer, dpi=IMAGE_DPI)
+        image_png = img_buffer.getvalue()
+        
+        if not use_graphviz:
+            svg_buffer = BytesIO()
+            plt.gcf().savefig(svg_buffer, format='svg', dpi=IMAGE_DPI)
+            image_svg = svg_buffer.getvalue()
     except Exception as exc:
         logger.warning(f"Decision tree image generation failed: {exc}", exc_info=True)
-        status = "failed"
+    finally:
+        plt.close(plt.gcf())
+    
+    if use_graphviz:
+        try:
+            dot = export_graphviz(model, out_file=None, feature_names=feature_names, filled=True)
+            image_svg = graphviz.Source(dot).pipe(format='svg')
+        except Exception as exc:
+            logger.warning(f"Decision tree SVG generation failed: {exc}", exc_info=True)
         
-    return image_base64, status
+    return image_png, image_svg
 
 
 def store_results_in_redis(
     task_id: str, 
-    db: int, 
+    prefix: str, 
     data: Dict[str, Any]
 ) -> str:
     """
     Store processing results in Redis.
     
+    Visualizations are stored under a separate key, so that reading the
+    results doesn't require transferring and decoding the images.
+    
     Args:
         task_id: Unique task identifier
-        db: Redis database to use
+        prefix: Key prefix of the processing stage the results belong to
         data: Dictionary of results to store
         
     Returns:
@@ -204,8 +247,15 @@ def store_results_in_redis(
     """
     status = 'success'
     try:
-        with redis_connection(db=db) as r:
-            r.set(task_id, json.dumps(data))
+        images = {field: data[field] for field in IMAGE_FIELDS if field in data}
+        results = {field: value for field, value in data.items() if field not in images}
+        with redis_connection() as r:
+            # Images are written first, so they are available once the results are
+            pipe = r.pipeline()
+            pipe.set(image_key(prefix, task_id), dumps(images))
+            pipe.set(task_key(prefix, task_id), dumps(results))
+            pipe.delete(processing_key(prefix, task_id))
+            pipe.execute()
     except Exception as exc:
         logger.error(f"Failed to store results in Redis: {exc}", exc_info=True)
         status = "failed"
@@ -213,6 +263,117 @@ def store_results_in_redis(
     return status
 
 
+def table_to_numpy(table: pa.Table) -> Tuple[np.ndarray, List[str]]:
+    """
+    Convert the data columns of an Arrow table to a 2D array, without building a DataFrame.
+    
+    Args:
+        table: Table written from a DataFrame; its stored pandas index is left out
+        
+    Returns:
+        Tuple containing:
+            - Array with a column per feature
+            - Names of the features
+    """
+    pandas_metadata = table.schema.pandas_metadata or {}
+    index_columns = {column for column in pandas_metadata.get('index_columns', []) if isinstance(column, str)}
+    feature_names = [name for name in table.column_names if name not in index_columns]
+    X = np.column_stack([table.column(name).to_numpy() for name in feature_names])
+    return X, feature_names
+
+
+class TaskFailed(Exception):
+    """Raised when a processing step fails; the cause has already been logged."""
+
+
+def failure_reason(exc: Exception) -> str:
+    """Reason of a failed task stored with its results and reported to clients."""
+    if isinstance(exc, TaskFailed):
+        return str(exc)
+    if isinstance(exc, SoftTimeLimitExceeded):
+        return "Time limit exceeded"
+    return "Unexpected error"
+
+
+def detect_outliers(task_id: str) -> Dict[str, Any]:
+    """
+    Run outlier detection for a task and return its results.
+    
+    Args:
+        task_id: Unique task identifier
+        
+    Returns:
+        Dictionary of results to store
+        
+    Raises:
+        TaskFailed: If a processing step fails
+    """
+    # Retrieve task data
+    with redis_connection() as r:
+        data_algorithm, rules_algorithm, n_estimators, dataset = r.hmget(
+            task_key(TASK_DATA_PREFIX, task_id), "data_algorithm", "rules_algorithm", "n_estimators", "dataset"
+        )
+
+    data_algorithm = data_algorithm.decode()
+    rules_algorithm = rules_algorithm.decode()
+    n_estimators = int(n_estimators) if n_estimators is not None else None
+
+    # Drop rows with missing values and convert the data to an array
+    try:
+        table = loads_table(dataset).drop_null()
+        X, feature_names = table_to_numpy(table)
+    except Exception as exc:
+        logger.error(f"Dataset conversion failed: {exc}", exc_info=True)
+        raise TaskFailed("Dataset conversion failed") from exc
+
+    # Share the cleaned dataset with the rule integration task
+    try:
+        with redis_connection() as r:
+            r.set(dataframe_key(task_id), dumps_table(table))
+    except Exception as exc:
+        logger.warning(f"Failed to store the dataset in Redis: {exc}", exc_info=True)
+
+    # Perform outlier detection
+    outlier_detection_model, status = load_outlier_model(data_algorithm, n_estimators)
+    if status == "failed":
+        raise TaskFailed("Outlier detection model could not be loaded")
+    try:
+        outlier_labels = outlier_detection_model.fit_predict(X)
+    except Exception as exc:
+        logger.error(f"Outlier detection failed: {exc}", exc_info=True)
+        raise TaskFailed("Outlier detection failed") from exc
+
+    # Load rules model and fit it to outlier detection results
+    model, status = load_model(rules_algorithm)
+    if status == "failed":
+        raise TaskFailed("Rules model could not be loaded")
+    try:
+        model.fit(X, outlier_labels, feature_names=feature_names)
+    except Exception as exc:
+        logger.error(f"Model fitting failed: {exc}", exc_info=True)
+        raise TaskFailed("Model fitting failed") from exc
+
+    # Generate visualization; the results are still usable without it
+    image_png, image_svg = generate_model_images(model, feature_names)
+
+    # Extract rules from model
+    rule_list, status = extract_rules_from_model(model, rules_algorithm, feature_names)
+
+    results = {
+        "status": status,
+        "image_png": image_png or b"",
+        "image_svg": image_svg or b"",
+        "rules": rule_list
+    }
+    if status == "failed":
+        results["error"] = "Rule extraction failed"
+    return results
+
+
+@celery_app.task(
+    name="outlier_detection_from_data", acks_late=True,
+    time_limit=TASK_TIME_LIMIT, soft_time_limit=TASK_SOFT_TIME_LIMIT
+)
 def outlier_detection_from_data(task_id: str) -> None:
     """
     Perform outlier detection on the provided data.
@@ -230,88 +391,109 @@ def outlier_detection_from_data(task_id: str) -> None:
     logger.info(f"Starting outlier detection for task {task_id}")
 
     try:
-        # Retrieve task data
-        with redis_connection(db=REDIS_TASK_DATA_DB) as r:
-            registered_data = json.loads(r.get(task_id))
-
-        data_algorithm = registered_data['data_algorithm']
-        rules_algorithm = registered_data['rules_algorithm']
-        data = registered_data['json_dict']
-
-        # Initialize results
-        status = "success"
-        image_base64 = ""
-        rules_serialized = serialize_list([])
-        
-        # Convert data to DataFrame
-        try:
-            df = pd.DataFrame(data).dropna()
-        except Exception as exc:
-            logger.error(f"DataFrame conversion failed: {exc}", exc_info=True)
-            status = "failed"
+        results = detect_outliers(task_id)
+    except Exception as exc:
+        if not isinstance(exc, TaskFailed):
+            logger.error(f"Unexpected error in outlier detection: {exc}", exc_info=True)
+        # Ensure we store failure status in Redis
+        results = {
+            "status": "failed",
+            "error": failure_reason(exc),
+            "image_png": b"",
+            "image_svg": b"",
+            "rules": []
+        }
 
-        # Perform outlier detection
-        if status != "failed":
-            try:
-                outlier_detection_model, status = load_outlier_model(data_algorithm)
-                if status != "failed":
-                    X = df.to_numpy()
-                    outlier_labels = outlier_detection_model.fit_predict(X)
-            except Exception as exc:
-                logger.error(f"Outlier detection failed: {exc}", exc_info=True)
-                status = "failed"
-
-        # Load rules model
-        model = None
-        if status != "failed":
-            model, status = load_model(rules_algorithm)
-
-        # Fit rules model to outlier detection results
-        if status != "failed" and model is not None:
-            try:
-                X = df.to_numpy()  # Ensure X is defined even if outlier detection was skipped
-                model.fit(X, outlier_labels, feature_names=list(df.columns))
-            except Exception as exc:
-                logger.error(f"Model fitting failed: {exc}", exc_info=True)
-                status = "failed"
-
-        # Generate visualization
-        if status != "failed" and model is not None:
-            image_base64, img_status = generate_model_image(model)
-            if img_status == "failed":
-                image_base64 = ""
-
-        # Extract rules from model
-        rule_list = []
-        if status != "failed" and model is not None:
-            rule_list, status = extract_rules_from_model(model, rules_algorithm, df)
-            rules_serialized = serialize_list(rule_list)
-
-        # Store results in Redis
-        store_results_in_redis(
-            task_id, 
-            REDIS_OUTLIER_RESULTS_DB,
-            {
-                "status": status,
-                "image_url": f"data:image/png;base64,{image_base64}" if image_base64 else "",
-                "rules": json.loads(rules_serialized)
-            }
-        )
+    # Store results in Redis
+    store_results_in_redis(task_id, OUTLIER_RESULTS_PREFIX, results)
+
+
+def integrate_expert_rules(task_id: str) -> Dict[str, Any]:
+    """
+    Integrate expert knowledge with the outlier detection results of a task and return the results.
+    
+    Args:
+        task_id: Unique task identifier
+        
+    Returns:
+        Dictionary of results to store
         
+    Raises:
+        TaskFailed: If a processing step fails
+    """
+    # Retrieve the needed task data fields, the outlier detection from data results and
+    # the cleaned dataset from Redis in a single round trip
+    with redis_connection() as r:
+        pipe = r.pipeline(transaction=False)
+        pipe.hmget(task_key(TASK_DATA_PREFIX, task_id), "expert_text", "rules_algorithm")
+        pipe.mget(task_key(OUTLIER_RESULTS_PREFIX, task_id), dataframe_key(task_id))
+        (expert_text, rules_algorithm), (data_outliers, df_data) = pipe.execute()
+
+    expert_text:str = expert_text.decode()
+    rules_algorithm:str = rules_algorithm.decode()
+
+    # Use the dataset cleaned by outlier detection, if it was stored
+    if df_data is not None:
+        df = loads_dataframe(df_data)
+    else:
+        with redis_connection() as r:
+            df = loads_dataframe(r.hget(task_key(TASK_DATA_PREFIX, task_id), "dataset")).dropna()
+    X = df.to_numpy(copy=False)
+
+    columns:list = df.columns.tolist()
+    assert len(columns) == X.shape[1], "Columns and data shape mismatch"
+
+    data_outliers_rules:list = loads(data_outliers)['rules']
+
+    inputs = {
+        'expert_text': expert_text,
+        'rules': data_outliers_rules,
+        'dataset_columns': columns
+    }
+    
+    result:CrewOutput = RulesExtractionAndIntegrationCrew().crew().kickoff(inputs=inputs)
+
+    try:
+        rules_integrated = orjson.loads(result.raw)['new_rules']
     except Exception as exc:
-        logger.error(f"Unexpected error in outlier detection: {exc}", exc_info=True)
-        # Ensure we store failure status in Redis
-        store_results_in_redis(
-            task_id, 
-            REDIS_OUTLIER_RESULTS_DB,
-            {
-                "status": "failed",
-                "image_url": "",
-                "rules": []
-            }
-        )
+        logger.error(f"Failed to parse new rules: {exc}", exc_info=True)
+        raise TaskFailed("Failed to parse the integrated rules") from exc
+
+    # Mark the rows matched by the integrated rules as outliers
+    new_df = apply_rules_to_dataset(rules_integrated, df)
+    replaced = new_df["outlier"].replace({True: -1, False: 1})
+    replaced = replaced.infer_objects(copy=False)
+    outlier_labels = replaced.to_numpy()
+
+    # Load rules model and fit it to the marked outliers
+    model, status = load_model(rules_algorithm)
+    if status == "failed":
+        raise TaskFailed("Rules model could not be loaded")
+    try:
+        model.fit(X, outlier_labels, feature_names=columns)
+    except Exception as exc:
+        logger.error(f"Model fitting failed: {exc}", exc_info=True)
+        raise TaskFailed("Model fitting failed") from exc
+
+    # Generate visualization; the results are still usable without it
+    image_png, image_svg = generate_model_images(model, columns)
 
+    # A failed extraction is logged, the results are stored with the rules extracted so far
+    rule_list, _ = extract_rules_from_model(model, rules_algorithm, columns)
 
+    return {
+        "status": "success",
+        "image_png": image_png or b"",
+        "image_svg": image_svg or b"",
+        "rules_integrated": rules_integrated, #integrated expert text & data
+        "new_rules": rule_list #rules from tree created from outlier mark from rules_integrated
+    }
+
+
+@celery_app.task(
+    name="extract_and_integrate_expert_rules", acks_late=True,
+    time_limit=TASK_TIME_LIMIT, soft_time_limit=TASK_SOFT_TIME_LIMIT
+)
 def extract_and_integrate_expert_rules(task_id: str) -> None:
     """
     Integrate expert knowledge with outlier detection results.
@@ -324,119 +506,28 @@ def extract_and_integrate_expert_rules(task_id: str) -> None:
     5. Extracts new human-readable rules from the model
     6. Stores results back to Redis
     
+    Results are stored on every exit, failures included, which also clears the
+    task's processing marker.
+    
     Args:
         task_id: Unique task identifier
     """
     logger.info(f"Starting expert rule integration for task {task_id}")
-    status = "success"
-    image_base64 = ""
 
     try:
-        # Retrieve task data
-        with redis_connection(db=REDIS_TASK_DATA_DB) as r:
-            registered_data = json.loads(r.get(task_id))
-        
-        # Wait for outlier detection results
-        with redis_connection(db=REDIS_OUTLIER_RESULTS_DB) as r:
-            data_outliers = r.get(task_id) # Retrieve the outlier detection from data results from Redis
-    
-
-        expert_text:str = registered_data['expert_text']
-        rules_algorithm:str = registered_data['rules_algorithm']
-        data:dict = registered_data['json_dict']
-
-        df = pd.DataFrame(data).dropna()
-        X = df.to_numpy()
-
-        columns:list = df.columns.tolist()
-        assert len(columns) == X.shape[1], "Columns and data shape mismatch"
-
-        data_outliers_rules:list = json.loads(data_outliers)['rules']
-
-        inputs = {
-            'expert_text': expert_text,
-            'rules': data_outliers_rules,
-            'dataset_columns': columns
-        }
-        
-        result:CrewOutput = RulesExtractionAndIntegrationCrew().crew().kickoff(inputs=inputs)
-        output = result.raw
-
-        try:
-            rules_integrated_d:dict = json.loads(output)
-            rules_integrated = rules_integrated_d['new_rules']
-            new_df = apply_rules_to_dataset(rules_integrated, df)
-
-            replaced = new_df["outlier"].replace({True: -1, False: 1})
-            replaced = replaced.infer_objects(copy=False)
-            outlier_labels = replaced.to_numpy()
-
-            model = None
-            if status != "failed":
-                model, status = load_model(rules_algorithm)
-
-            if status != "failed" and model is not None:
-                try:
-                    model.fit(X, outlier_labels, feature_names=columns)
-                except Exception as exc:
-                    logger.error(f"Model fitting failed: {exc}")
-                    status = "failed"
-            
-            if status != "failed" and model is not None:    
-                try:
-                    img_buffer = BytesIO()
-                    model.plot(filename=img_buffer, dpi=600)
-                    img_buffer.seek(0)
-                    image_base64 = base64.b64encode(img_buffer.getvalue()).decode('utf-8')
-                except Exception as exc:
-                    image_base64 = None
-                    logging.error(f"Decision tree image generation failed: {exc}")
-
-            rule_list = []
-            if status != "failed" and model is not None:
-                try:
-                    if rules_algorithm == 'FIGS':
-                        tree_data = trunc_output(str(model)).split('\n')
-                        root = create_tree(tree_data)
-                        extract_rules(root, rule_list, '')
-                    else:
-                        # OptimalTree and GreedyTree - nie wchodza feature names
-                        columns = df.columns.tolist()
-                        tree_data = str(model)
-                        feature_no_to_column = {f"feature_{i}": columns[i] for i in range(len(columns))}
-
-                        rule_list_raw_feature = parse_tree_to_rules(tree_data)
-                        for rule in rule_list_raw_feature:
-                            for k,v in feature_no_to_column.items():
-                                rule = rule.replace(k, v)
-                            
-                            rule_list.append(rule)
-                except Exception as exc:
-                    logging.warning(f"Rule extraction failed: {exc}")
-            
-                try:
-                    with redis_connection(db=REDIS_INTEGRATED_RESULTS_DB) as r:
-                        r.set(task_id, json.dumps({
-                            "status": status,
-                            "image_url": f"data:image/png;base64,{image_base64}" if image_base64 else "",
-                            "rules_integrated": json.loads(serialize_list(rules_integrated)), #integrated expert text & data
-                            "new_rules":json.loads(serialize_list(rule_list)) #rules from tree created from outlier mark from rules_integrated
-                        }))
-                except Exception as exc:
-                    logging.error(f"Failed to store results in Redis: {exc}")
-            
-        except Exception as exc:
-            logging.error(f"Failed to parse new rules: {exc}")
+        results = integrate_expert_rules(task_id)
     except Exception as exc:
-        logger.error(f"Unexpected error in expert rule integration: {exc}", exc_info=True)
+        if not isinstance(exc, TaskFailed):
+            logger.error(f"Unexpected error in expert rule integration: {exc}", exc_info=True)
         # Ensure we store failure status in Redis
-        store_results_in_redis(
-            task_id, 
-            REDIS_INTEGRATED_RESULTS_DB,
-            {
-                "status": "failed",
-                "image_url": "",
-                "rules_integrated": [],
-                "new_rules": []
-            }
-        )
\ No newline at end of file
+        results = {
+            "status": "failed",
+            "error": failure_reason(exc),
+            "image_png": b"",
+            "image_svg": b"",
+            "rules_integrated": [],
+            "new_rules": []
+        }
+
+    # Store results in Redis
+    store_results_in_redis(task_id, INTEGRATED_RESULTS_PREFIX, results)
@@ -1,4 +1,20 @@
+import io
 import re
+import sys
+
+# Lines with a condition node or leaf info after the indentation prefix, e.g.:
+# '|   |--- feature_8 <= 462.55'
+# '|   |   |--- weights: [0.00, 6.00] class: 1.0'
+# A single pattern is matched per line, the alternative that matched is told by its groups
+_LINE_RE = re.compile(
+    r'^\s*\|(?P<indent>[\|\s-]+)\s+(?P<body>'
+    r'(?P<feature>feature_\d+)\s*(?P<op><=|>|<=|>=)\s*(?P<value>[0-9\.]+)'
+    r'|weights:\s*\[(?P<w0>[0-9\.]+),\s*(?P<w1>[0-9\.]+)\]\s+class:\s*(?P<cls>[0-9\.]+)'
+    r')\s*$'
+)
+
+# Each occurrence in the prefix of a line is one level of depth
+_DEPTH_MARKER = '|   '
 
 def parse_tree_to_rules(tree_text):
     """
@@ -6,76 +22,67 @@ def parse_tree_to_rules(tree_text):
     into a list of rules in the format:
     
     IF <condition1> AND <condition2> AND ... THEN <INLIER|OUTLIER>
+    
+    The tree can be given as text or as an iterable of lines, e.g. an open file.
     """
     
-    # Split the text into lines
-    lines = tree_text.strip().splitlines()
+    # Read the lines one at a time; blank lines don't match and whitespace around
+    # a line is allowed by the pattern, so the text doesn't need to be stripped first
+    lines = io.StringIO(tree_text, newline=None) if isinstance(tree_text, str) else tree_text
     
-    # A stack for the current path of conditions
+    # A stack for the current path of conditions; only the first `top` entries are
+    # on the path, entries above it are overwritten instead of popped
     path_stack = []
+    top = 0
     
     # This will hold final rules
     rules = []
     
-    # Regex to detect lines with conditions, e.g.:
-    # '|   |--- feature_8 <= 462.55'
-    condition_pattern = re.compile(r'^\s*\|(?P<indent>[\|\s-]+)\s+(?P<feature>feature_\d+)\s*(?P<op><=|>|<=|>=)\s*(?P<value>[0-9\.]+)\s*$')
-    
-    # Regex to detect lines with leaf info, e.g.:
-    # '|   |   |--- weights: [0.00, 6.00] class: 1.0'
-    leaf_pattern = re.compile(
-        r'^\s*\|(?P<indent>[\|\s-]+)\s+weights:\s*\[(?P<w0>[0-9\.]+),\s*(?P<w1>[0-9\.]+)\]\s+class:\s*(?P<cls>[0-9\.]+)\s*$'
-    )
-    
-    # We will track how "deep" each line is by counting occurrences of "|   "
-    # so we can pop from the path_stack if we move back up the tree
-    def get_depth(line):
-        # Each "   " after a "|" is one depth. Counting them can help.
-        # Alternatively, we can count the number of occurrences of "|   " 
-        # at the line start.
-        return line.count("|   ")
-    
     prev_depth = 0
     
+    line_match = _LINE_RE.match
+    
     for line in lines:
-        # Check if line is a condition node
-        condition_match = condition_pattern.match(line)
-        leaf_match = leaf_pattern.match(line)
+        match = line_match(line)
+        if match is None:
+            # Some lines might be empty or not match anything
+            continue
+        
+        # Only the prefix is scanned for the depth, conditions and leaf info don't contain it
+        depth = line.count(_DEPTH_MARKER, 0, match.start("body"))
+        feature = match.group("feature")
         
-        if condition_match:
-            # Extract depth
-            depth = get_depth(line)
-            feature = condition_match.group("feature")
-            operator = condition_match.group("op")
-            value = condition_match.group("value")
+        if feature is not None:
+            # Trees split on the same few features many times, so their names are interned
+            feature = sys.intern(feature)
+            operator = match.group("op")
+            value = match.group("value")
             
-            # If we moved back up in depth, pop from path_stack
-            while len(path_stack) > depth:
-                path_stack.pop()
+            # If we moved back up in depth, drop the deeper conditions
+            top = min(top, depth)
                 
             # Add condition to the path stack
-            path_stack.append((feature, operator, value))
+            if top < len(path_stack):
+                path_stack[top] = (feature, operator, value)
+            else:
+                path_stack.append((feature, operator, value))
+            top += 1
             
             # Update prev_depth
             prev_depth = depth
             
-        elif leaf_match:
-            # Extract depth
-            depth = get_depth(line)
-            w0 = float(leaf_match.group("w0"))
-            w1 = float(leaf_match.group("w1"))
-            leaf_class = float(leaf_match.group("cls"))
+        else:
+            w0 = float(match.group("w0"))
+            w1 = float(match.group("w1"))
+            leaf_class = float(match.group("cls"))
             
-            # If we moved back up in depth, pop from path_stack
-            while len(path_stack) > depth:
-                path_stack.pop()
+            # If we moved back up in depth, drop the deeper conditions
+            top = min(top, depth)
             
             # Now the path_stack is the list of conditions for this leaf
             # Convert them into textual form
-            conditions_text = []
-            for (feat, op, val) in path_stack:
-                # e.g. "feature_8 <= 462.55"
-                conditions_text.append(f"{feat} {op} {val}")
+            # e.g. "feature_8 <= 462.55"
+            conditions_text = [f"{feat} {op} {val}" for (feat, op, val) in path_stack[:top]]
             
             # Determine status
             if leaf_class == 0.0:
@@ -95,11 +102,6 @@ def parse_tree_to_rules(tree_text):
             
             # Update prev_depth
             prev_depth = depth
-            
-        else:
-            # Some lines might be empty or not match anything
-            # We don't do anything with them
-            continue
     
     return rules
 
@@ -146,5 +148,4 @@ if __name__ == "__main__":
 
     # Parse tree and print rules
     all_rules = parse_tree_to_rules(tree_string)
-    for rule in all_rules:
-        print(rule)
\ No newline at end of file
+    print("\n".join(all_rules))
\ No newline at end of file
@@ -1,77 +1,51 @@
-class TreeNode:
-    """
-    Represents a node in a binary decision tree.
+from functools import lru_cache
 
-    Attributes:
-        value (str): The data or condition stored in the node.
-        left (TreeNode): Left child node.
-        right (TreeNode): Right child node.
-        root (bool): Flag indicating if this node is the tree's root.
-    """
-    def __init__(self, value):
-        self.value = value
-        self.left = None
-        self.right = None
-        self.root = False
+# Class of the leaves that produce a rule, by leaf value: 1 for outliers, 0 for inliers
+LEAF_CLASSES = {
+    'Val: 1.000 (leaf)': 1,
+    'Val: 0.000 (leaf)': 0,
+}
+
+# Endings of the lines of the root node and split nodes, checked in a single call
+SPLIT_MARKERS = ("(Tree #0 root)", "(split)")
 
-def trunc_output(input_str):
+def trunc_lines(input_str):
     """
-    Truncate the first five lines from the input string, typically used to remove model headers.
+    Split the input string into lines, without the first five lines of model headers.
 
     Args:
         input_str (str): The output string from a model.
 
     Returns:
-        str: The truncated string.
+        list of str: The remaining lines; a single empty line if there are none.
     """
-    lines = input_str.splitlines()
-    return "\n".join(lines[5:])
+    return input_str.splitlines()[5:] or ['']
 
-def create_tree(lines, parent=None):
+def _right_child_index(lines, start, end, child_level):
     """
-    Recursively construct a binary tree from a list of lines describing nodes and their structure.
-
-    The root node is identified by "(Tree #0 root)", and split nodes by "(split)".
-    Lines are indented with '\t' to indicate tree depth.
+    Find the first line of the right subtree of the node at lines[start], or None if it has one child.
 
-    Args:
-        lines (list of str): Lines representing nodes in a decision tree.
-        parent (TreeNode, optional): The parent node for the current node; defaults to None.
-
-    Returns:
-        TreeNode: The root node of the constructed binary tree.
+    The lines after a node are one level deeper; its children are the lines without
+    a further leading '\t', and the second one starts the right subtree.
     """
-    first_line = lines[0].strip()
-    if first_line.endswith("(Tree #0 root)") or first_line.endswith("(split)"):
-        node_value = lines[0].replace('(Tree #0 root)', '').replace('(split)', '').rstrip()
-        current_node = TreeNode(node_value)
-
-        # Mark node as root if applicable
-        if first_line.endswith("(Tree #0 root)"):
-            current_node.root = True
-
-        # Move to subsequent lines
-        lines = lines[1:]
-        # Remove one level of indentation
-        lines = [line[1:] for line in lines]
-
-        # Identify child positions (lines without a leading '\t')
-        child_indices = [i for i, line in enumerate(lines) if not line.startswith('\t')]
-        if len(child_indices) > 1:
-            right_index = child_indices[1]
-            current_node.left = create_tree(lines[:right_index], current_node)
-            current_node.right = create_tree(lines[right_index:], current_node)
-        else:
-            # Handle case with only one child
-            current_node.left = create_tree(lines, current_node)
-    else:
-        # Leaf node or simple node
-        current_node = TreeNode(lines[0])
-        current_node.left = None
-        current_node.right = None
-
-    return current_node
-
+    children = 0
+    for i in range(start + 1, end):
+        if lines[i][child_level:child_level + 1] != '\t':
+            children += 1
+            if children == 2:
+                return i
+    return None
+
+# Operators in the order they are looked up; two-character operators come first,
+# so that ' >= ' is not mistaken for ' > '
+INVERTED_OPERATORS = (
+    (' >= ', ' < '),
+    (' <= ', ' > '),
+    (' > ', ' <= '),
+    (' < ', ' >= '),
+)
+
+@lru_cache(maxsize=4096)
 def invert_comparison_operators(input_str):
     """
     Invert comparison operators in a given string.
@@ -88,37 +62,69 @@ def invert_comparison_operators(input_str):
     Returns:
         str: String with the inverted comparison operator.
     """
-    if ' >= ' in input_str:
-        return input_str.replace(' >= ', ' < ')
-    elif ' <= ' in input_str:
-        return input_str.replace(' <= ', ' > ')
-    elif ' > ' in input_str:
-        return input_str.replace(' > ', ' <= ')
-    elif ' < ' in input_str:
-        return input_str.replace(' < ', ' >= ')
+    for operator, inverted in INVERTED_OPERATORS:
+        if operator in input_str:
+            return input_str.replace(operator, inverted)
     return input_str
 
-def extract_rules(node, rules, rule):
+def extract_rules_from_lines(lines, rules):
     """
-    Recursively traverse a binary decision tree and build human-readable decision rules.
+    Build human-readable decision rules from the lines describing a binary decision tree.
+
+    The root node is identified by "(Tree #0 root)", and split nodes by "(split)".
+    Lines are indented with '\t' to indicate tree depth.
 
     Args:
-        node (TreeNode): The current tree node.
+        lines (list of str): Lines representing nodes in a decision tree.
         rules (list of str): Accumulator for storing generated rules.
-        rule (str): Current rule string being built.
 
     Returns:
         None: Appends generated rules directly to the 'rules' list.
+
+    Raises:
+        ValueError: If there are no lines or a split node has no right child.
     """
-    if node.root is True:
-        # Start rule building from the root, generating branches
-        extract_rules(node.left, rules, f"IF {invert_comparison_operators(node.value)}")
-        extract_rules(node.right, rules, f"IF {node.value}")
-    elif not node.root and node.left is not None:
-        # Internal node with conditions
-        extract_rules(node.left, rules, f"{rule} AND {invert_comparison_operators(node.value)}")
-        extract_rules(node.right, rules, f"{rule} AND {node.value}")
-    elif node.left is None and node.value == 'Val: 1.000 (leaf)':
-        rules.append(f"{rule} THEN OUTLIER")
-    elif node.left is None and node.value == 'Val: 0.000 (leaf)':
-        rules.append(f"{rule} THEN INLIER")
\ No newline at end of file
+    # Depth-first traversal with an explicit stack, left branches first. Each entry holds the
+    # range of lines of a subtree, the number of indentation characters to remove from them,
+    # the start of its rule and the conditions added after it, as a linked list of
+    # (condition, previous conditions) pairs shared by sibling branches; the rule text
+    # is only joined once a leaf is reached.
+    stack = [(0, len(lines), 0, '', None)]
+
+    while stack:
+        start, end, level, rule, conditions = stack.pop()
+        if start >= end:
+            raise ValueError("Tree without lines")
+
+        line = lines[start][level:]
+        first_line = line.strip()
+        if first_line.endswith(SPLIT_MARKERS):
+            node_value = line.replace('(Tree #0 root)', '').replace('(split)', '').rstrip()
+            inverted_value = invert_comparison_operators(node_value)
+            if first_line.endswith("(Tree #0 root)"):
+                # Start rule building from the root, generating branches
+                left = (f"IF {inverted_value}", None)
+                right = (f"IF {node_value}", None)
+            else:
+                left = (rule, (inverted_value, conditions))
+                right = (rule, (node_value, conditions))
+
+            child_level = level + 1
+            right_index = _right_child_index(lines, start, end, child_level)
+            if right_index is None:
+                raise ValueError(f"Split node {first_line!r} has no right child")
+
+            # The right subtree is pushed first, so that the left one is handled first
+            stack.append((right_index, end, child_level) + right)
+            stack.append((start + 1, right_index, child_level) + left)
+        else:
+            leaf_class = LEAF_CLASSES.get(line)
+            if leaf_class is not None:
+                parts = []
+                while conditions is not None:
+                    condition, conditions = conditions
+                    parts.append(condition)
+                parts.append(rule)
+                parts.reverse()
+                outcome = 'OUTLIER' if leaf_class else 'INLIER'
+                rules.append(f"{' AND '.join(parts)} THEN {outcome}")
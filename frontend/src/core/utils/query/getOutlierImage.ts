@@ -1,8 +1,8 @@
-import axios from "axios";
+import { getWhenReady } from "./getWhenReady";
 
 async function retrieveOutlierImage(url: string) {
   try {
-    const response = await axios.get(url);
+    const response = await getWhenReady(url);
 
     if (response.status === 200) {
       return response.data.image_url;
@@ -0,0 +1,31 @@
+import axios, { AxiosResponse } from "axios";
+
+// Results are computed by background workers after registration. While they
+// are computed, the API answers with 202 (still processing) or 404 (not stored
+// yet); failed tasks are answered with an error status, which ends polling.
+const POLL_INTERVAL_MS = 2000;
+const MAX_POLL_ATTEMPTS = 300;
+
+function wait(ms: number) {
+  return new Promise((resolve) => setTimeout(resolve, ms));
+}
+
+export async function getWhenReady(url: string): Promise<AxiosResponse> {
+  for (let attempt = 1; ; attempt++) {
+    try {
+      const response = await axios.get(url);
+      if (response.status !== 202 || attempt >= MAX_POLL_ATTEMPTS) {
+        return response;
+      }
+    } catch (error) {
+      if (
+        !axios.isAxiosError(error) ||
+        error.response?.status !== 404 ||
+        attempt >= MAX_POLL_ATTEMPTS
+      ) {
+        throw error;
+      }
+    }
+    await wait(POLL_INTERVAL_MS);
+  }
+}